@@ -4,21 +4,38 @@ import pickle
 import joblib
 import pandas as pd
 import numpy as np
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import random
 from datetime import datetime
 import gspread
 from google.oauth2.service_account import Credentials
 import json
+import re
+import sys
+import zlib
+import signal
+import threading
+from functools import lru_cache
+from feature_store import load_feature_store
+from event_stream import EventBroker
+from traffic_generator import TrafficGenerator
+from static_assets import StaticAssetCache
+from state_snapshot import SnapshotWorker
+from drift_monitor import DriftMonitor, load_reference_profile
+from request_profiler import RequestProfiler
 
 # ---------------------
 
 # Initialize Flask app
-# We set static_folder to '.' so it can serve style.css and script.js from the same directory
-app = Flask(__name__, static_folder='.', static_url_path='')
+# Flask's own static route is disabled: with static_folder='.' it would serve
+# every file in this directory (local_db.json, *.pkl, ...). Pages, CSS and JS
+# are served from the in-memory allowlist in static_assets.py instead.
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for local development
 
+static_assets = StaticAssetCache(os.path.dirname(os.path.abspath(__file__)))
+
 # ------------------------------------------------------------------------------
 # MODEL LOADING SECTION
 # ------------------------------------------------------------------------------
@@ -39,85 +56,168 @@ try:
 except Exception as e:
     print(f"Error loading model: {e}")
 
+# Label encoders saved by train_model.py (loaded once, not per request)
+encoders = {}
+if os.path.exists('encoders.pkl'):
+    try:
+        encoders = joblib.load('encoders.pkl')
+    except Exception as e:
+        print(f"Error loading encoders: {e}")
+
+# Serve-time drift sketches, compared with the training profile from train_model.py
+drift_monitor = None
+try:
+    drift_monitor = DriftMonitor(load_reference_profile())
+    if drift_monitor.reference:
+        print("Drift reference profile loaded successfully!")
+    else:
+        print("Warning: drift reference profile not found. Drift will be reported without comparison.")
+except Exception as e:
+    print(f"Error loading drift reference profile: {e}")
+    drift_monitor = DriftMonitor()
+
+# Historical per-merchant/category/city aggregates built by train_model.py.
+# Tables are memory-mapped, so this is cheap even for very large stores.
+feature_store = None
+try:
+    feature_store = load_feature_store()
+    if feature_store:
+        print("Feature store loaded successfully!")
+    else:
+        print("Warning: feature store not found. Using placeholder entity features.")
+except Exception as e:
+    print(f"Error loading feature store: {e}")
+
 # ------------------------------------------------------------------------------
 # ROUTES
 # ------------------------------------------------------------------------------
 
+def _asset_response(name):
+    response = static_assets.respond(name, request.headers, request.args, Response)
+    if response is None:
+        return "File not found", 404
+    return response
+
 @app.route('/')
 def home():
     """Serve the Authentication/Landing page"""
-    return send_from_directory('.', 'auth.html')
+    return _asset_response('auth.html')
 
 @app.route('/dashboard')
 def dashboard():
     """Serve the Main Dashboard"""
-    return send_from_directory('.', 'dashboard.html')
+    return _asset_response('dashboard.html')
 
 @app.route('/<path:path>')
 def serve_static(path):
-    """Serve other static files like web.html, style.css, script.js"""
-    if os.path.exists(path):
-        return send_from_directory('.', path)
-    return "File not found", 404
+    """Serve other static files like web.html, style.css, script.js (allowlisted only)"""
+    return _asset_response(path)
 
 # --- Prediction Endpoint ---
 
 # --- Yaksha Chatbot Logic ---
+# Intent table, in priority order. Each rule fires when ALL of its tags were
+# found in the message. Keywords match whole words; a trailing '*' also
+# matches longer words ("prevent*" -> "prevention"), so "hi" no longer
+# matches "this".
+CHAT_KEYWORDS = {
+    'explain': ['explain*', 'why', 'what happened', 'details'],
+    'greeting': ['hello', 'hi', 'hey', 'greetings'],
+    'identity': ['who are you', 'what are you'],
+    'prevention': ['solution*', 'prevent*', 'protect*', 'safe*'],
+    'card': ['credit card*', 'card*'],
+    'lost': ['lost', 'stolen'],
+    'cvv': ['cvv*'],
+}
+
+CHAT_RULES = [
+    # 1. Contextual Analysis (needs riskFactors in the context, see get_response)
+    ({'explain'}, None),
+    # 2. General Knowledge / FAQ
+    ({'greeting'}, "Greetings, traveler. The Vault is secure. How may I assist you in protecting your wealth?"),
+    ({'identity'}, "I am Yaksha, the Ancient Guardian of Digital Wealth. My vigil is eternal, my vision absolute."),
+    ({'prevention'}, ("To protect your treasure: \n"
+                      "1. Enable 2-Factor Authentication (The Double Lock).\n"
+                      "2. Set transaction limits (The Gatekeeper).\n"
+                      "3. Monitor your alerts (The Watchtower).\n"
+                      "4. Never share your OTP (The Key) with anyone.")),
+    ({'card', 'lost'}, "If your key (card) is lost, you must seal the gates instantly. Contact your bank to freeze the card. Do not hesitate."),
+    ({'card', 'cvv'}, "The CVV is the secret rune on the back of your card. Never share it. If compromised, the lock is broken."),
+    ({'card'}, "The credit card is a powerful tool, but dangerous if unguarded. Keep it close, check your statements for shadows, and never lend it to strangers."),
+]
+
+CHAT_FALLBACK = "I hear you, but the path is unclear. Ask me about 'fraud prevention', 'credit card security', or show me a transaction to analyze."
+
+# Risk factor -> explanation sentence (first matching substring wins)
+FACTOR_EXPLANATIONS = [
+    (("Impossible Location",), " I detected the 'Superman Effect'. The card was used in two distant locations nearly simultaneously. This is physical impossibility and a sign of cloning. "),
+    (("Frequency",), " The 'Swift Hand' anomaly was present. Too many transactions occurred in a short span, suggesting a bot or a thief testing the card. "),
+    (("Spike", "Amount"), " The 'Heavy Coffer' alert. A withdrawal or purchase was made that vastly exceeds typical patterns. "),
+]
+
+MAX_CHAT_BATCH = 100
+
+def _compile_keywords(keywords):
+    """One regex for every keyword; the named group that matched gives the tag."""
+    alternatives = []
+    group_tags = {}
+    # Longest first so "credit card" wins over "card"
+    entries = sorted(((kw, tag) for tag, kws in keywords.items() for kw in kws),
+                     key=lambda e: len(e[0]), reverse=True)
+    for i, (kw, tag) in enumerate(entries):
+        stem = kw.endswith('*')
+        words = kw.rstrip('*').split()
+        body = r'\s+'.join(re.escape(w) for w in words)
+        group = f'k{i}'
+        group_tags[group] = tag
+        tail = r'\w*' if stem else r'\b'
+        alternatives.append(f'(?P<{group}>{body}){tail}')
+    return re.compile(r'\b(?:' + '|'.join(alternatives) + ')'), group_tags
+
+@lru_cache(maxsize=512)
+def _explain_factors(factors):
+    """Explanation text for a tuple of risk factors (cached, factor sets repeat a lot)."""
+    text = ""
+    for factor in factors:
+        for needles, sentence in FACTOR_EXPLANATIONS:
+            if any(n in factor for n in needles):
+                text += sentence
+                break
+    return text
+
 class YakshaChatbot:
+    def __init__(self):
+        self.pattern, self.group_tags = _compile_keywords(CHAT_KEYWORDS)
+
+    def match_tags(self, msg):
+        """All intent tags found in msg, in a single pass."""
+        return {self.group_tags[m.lastgroup] for m in self.pattern.finditer(msg.lower())}
+
     def get_response(self, user_message, context=None):
         """
         Generates a response based on user message and context.
         Context: { 'riskScore': int, 'riskFactors': list }
         """
-        msg = user_message.lower()
-        response = ""
-        
-        # 1. Contextual Analysis (If a fraud was just detected)
-        if context and context.get('riskFactors') and ("explain" in msg or "why" in msg or "what happened" in msg or "details" in msg):
-            factors = context.get('riskFactors', [])
-            score = context.get('riskScore', 0)
-            
-            response += f"I have analyzed the transaction. The threat level is {score}%. "
-            
-            for factor in factors:
-                if "Impossible Location" in factor:
-                    response += " I detected the 'Superman Effect'. The card was used in two distant locations nearly simultaneously. This is physical impossibility and a sign of cloning. "
-                elif "Frequency" in factor:
-                    response += " The 'Swift Hand' anomaly was present. Too many transactions occurred in a short span, suggesting a bot or a thief testing the card. "
-                elif "Spike" in factor or "Amount" in factor:
-                    response += " The 'Heavy Coffer' alert. A withdrawal or purchase was made that vastly exceeds typical patterns. "
-            
-            response += " I recommend freezing the card immediately."
-            return response
+        tags = self.match_tags(user_message)
+
+        for required, reply in CHAT_RULES:
+            if not required <= tags:
+                continue
+            if reply is None:
+                # 1. Contextual Analysis (If a fraud was just detected)
+                if not (context and context.get('riskFactors')):
+                    continue
+                score = context.get('riskScore', 0)
+                # Cache key from the string factors only (clients may send anything)
+                factors = context['riskFactors']
+                factors = tuple(f for f in factors if isinstance(f, str)) if isinstance(factors, list) else ()
+                return (f"I have analyzed the transaction. The threat level is {score}%. "
+                        + _explain_factors(factors)
+                        + " I recommend freezing the card immediately.")
+            return reply
 
-        # 2. General Knowledge / FAQ
-        
-        # Greetings
-        if any(x in msg for x in ["hello", "hi", "hey", "greetings"]):
-            return "Greetings, traveler. The Vault is secure. How may I assist you in protecting your wealth?"
-            
-        # Identity
-        if "who are you" in msg or "what are you" in msg:
-            return "I am Yaksha, the Ancient Guardian of Digital Wealth. My vigil is eternal, my vision absolute."
-            
-        # Fraud Solutions / Prevention
-        if "solution" in msg or "prevent" in msg or "protect" in msg or "safe" in msg:
-            return ("To protect your treasure: \n"
-                    "1. Enable 2-Factor Authentication (The Double Lock).\n"
-                    "2. Set transaction limits (The Gatekeeper).\n"
-                    "3. Monitor your alerts (The Watchtower).\n"
-                    "4. Never share your OTP (The Key) with anyone.")
-                    
-        # Credit Card Doubts
-        if "credit card" in msg or "card" in msg:
-            if "lost" in msg or "stolen" in msg:
-                return "If your key (card) is lost, you must seal the gates instantly. Contact your bank to freeze the card. Do not hesitate."
-            if "cvv" in msg:
-                return "The CVV is the secret rune on the back of your card. Never share it. If compromised, the lock is broken."
-            return "The credit card is a powerful tool, but dangerous if unguarded. Keep it close, check your statements for shadows, and never lend it to strangers."
-            
         # Default fallback
-        return "I hear you, but the path is unclear. Ask me about 'fraud prevention', 'credit card security', or show me a transaction to analyze."
+        return CHAT_FALLBACK
 
 chatbot_engine = YakshaChatbot()
 
@@ -128,8 +228,6 @@ def chat():
         user_message = data.get('message', '')
         context = data.get('context', {}) # { riskScore: ..., riskFactors: ... }
         
-        print(f"Chat Request: {user_message} | Context: {context}")
-        
         reply = chatbot_engine.get_response(user_message, context)
         
         return jsonify({'reply': reply})
@@ -137,6 +235,29 @@ def chat():
         print(f"Chat error: {e}")
         return jsonify({'reply': "My vision is clouded (System Error). Please try again."}), 500
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """
+    Answer several messages in one request.
+    Body: { messages: [{ message, context }, ...] } -> { replies: [...] }
+    """
+    try:
+        data = request.get_json(silent=True)
+        messages = data.get('messages', []) if isinstance(data, dict) else None
+        if not isinstance(messages, list) or not all(
+                isinstance(m, dict) and isinstance(m.get('message', ''), str)
+                and isinstance(m.get('context') or {}, dict) for m in messages):
+            return jsonify({'error': 'messages must be a list of {message, context} objects.'}), 400
+        if len(messages) > MAX_CHAT_BATCH:
+            return jsonify({'error': f'At most {MAX_CHAT_BATCH} messages per batch.'}), 400
+
+        replies = [chatbot_engine.get_response(m.get('message', ''), m.get('context') or {})
+                   for m in messages]
+        return jsonify({'replies': replies})
+    except Exception as e:
+        print(f"Chat error: {e}")
+        return jsonify({'error': "My vision is clouded (System Error). Please try again."}), 500
+
 # --- Prediction Endpoint ---
 # --- Prediction Endpoint ---
 # --- Behavioral Analysis Plugin ---
@@ -148,6 +269,8 @@ class BehavioralAnalyzer:
         # Config
         self.MAX_HISTORY = 10
         self.VELOCITY_WINDOW_SECONDS = 300 # 5 minutes
+        # Bumped on every change so snapshots can skip unchanged state
+        self.version = 0
         
     def add_transaction(self, amount, lat, long, timestamp):
         """Add transaction to history and trim older ones."""
@@ -160,6 +283,19 @@ class BehavioralAnalyzer:
         # Keep only recent N
         if len(self.history) > self.MAX_HISTORY:
             self.history.pop(0)
+        self.version += 1
+
+    def to_records(self, history):
+        """History entries as (amount, lat, long, timestamp) tuples for snapshots."""
+        return [(tx['amount'], tx['lat'], tx['long'], tx['timestamp']) for tx in history]
+
+    def load_state(self, records, version=0):
+        """Replace history with records from a snapshot."""
+        self.history = [
+            {'amount': amount, 'lat': lat, 'long': long, 'timestamp': timestamp}
+            for amount, lat, long, timestamp in records[-self.MAX_HISTORY:]
+        ]
+        self.version = version
 
     def analyze(self, current_amount, current_lat, current_long, current_time_unix):
         """
@@ -242,254 +378,398 @@ class BehavioralAnalyzer:
 
 # Global Instance
 analyzer = BehavioralAnalyzer()
+# Held while scoring reads/updates analyzer history (shared with request
+# threads, the traffic generator and the snapshot thread)
+fusion_lock = threading.Lock()
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    try:
-        data = request.json
-        last_tx = analyzer.history[-1] if analyzer.history else None
-        print(f"Received data: {data}")
-        
-        # 1. Extract Frontend Data
-        amount = float(data.get('amount', 0))
-        merchant = data.get('merchant', 'unknown')
-        category = data.get('cardType', 'misc_net')  
-        location_input = data.get('location', 'Unknown, UNK')
-        time_str = data.get('time', '00:00')
-        date_str = data.get('date', datetime.now().strftime('%Y-%m-%d'))
-        
-        # Parse City/State from location
-        if ',' in location_input:
-            city, state = [x.strip() for x in location_input.split(',', 1)]
-        else:
-            city, state = location_input, "UNK"
-
-        # 2. Mock/Default Missing Features 
-        # Smart Lat/Long Generation based on History & Input
-        # This allows the user to DEMO the specific anomalies.
-        # Smart Geolocation (Mock Geocoding)
-        CITY_COORDS = {
-            # --- India ---
-            'kolkata': (22.5726, 88.3639), 'calcutta': (22.5726, 88.3639),
-            'delhi': (28.7041, 77.1025), 'new delhi': (28.7041, 77.1025),
-            'mumbai': (19.0760, 72.8777), 'bombay': (19.0760, 72.8777),
-            'chennai': (13.0827, 80.2707), 'madras': (13.0827, 80.2707),
-            'bangalore': (12.9716, 77.5946), 'bengaluru': (12.9716, 77.5946),
-            'hyderabad': (17.3850, 78.4867),
-            'pune': (18.5204, 73.8567),
-            'ahmedabad': (23.0225, 72.5714),
-            'jaipur': (26.9124, 75.7873),
-            'surat': (21.1702, 72.8311),
-            'lucknow': (26.8467, 80.9462),
-            'kanpur': (26.4499, 80.3319),
-            'indore': (22.7196, 75.8577),
-            'bhopal': (23.2599, 77.4126),
-            'patna': (25.5941, 85.1376),
-            'vadodara': (22.3072, 73.1812),
-            'ghaziabad': (28.6692, 77.4538),
-            'ludhiana': (30.9010, 75.8573),
-            'agra': (27.1767, 78.0081),
-            'nashik': (19.9975, 73.7898),
-            'faridabad': (28.4089, 77.3178),
-            'meerut': (28.9845, 77.7064),
-            'rajkot': (22.3039, 70.8022),
-            'varanasi': (25.3176, 82.9739), 'banaras': (25.3176, 82.9739),
-            'srinagar': (34.0837, 74.7973),
-            'aurangabad': (19.8762, 75.3433),
-            'dhanbad': (23.7957, 86.4304),
-            'amritsar': (31.6340, 74.8723),
-            'allahabad': (25.4358, 81.8463), 'prayagraj': (25.4358, 81.8463),
-            'ranchi': (23.3441, 85.3096),
-            'coimbatore': (11.0168, 76.9558),
-            'jabalpur': (23.1815, 79.9864),
-            'gwalior': (26.2183, 78.1828),
-            'vijayawada': (16.5062, 80.6480),
-            'jodhpur': (26.2389, 73.0243),
-            'madurai': (9.9252, 78.1198),
-            'raipur': (21.2514, 81.6296),
-            'kota': (25.2138, 75.8648),
-            'guwahati': (26.1445, 91.7362),
-            'chandigarh': (30.7333, 76.7794),
-            'mysore': (12.2958, 76.6394),
-            'gurgaon': (28.4595, 77.0266), 'gurugram': (28.4595, 77.0266),
-            'noida': (28.5355, 77.3910),
-            'dehradun': (30.6340, 78.0297),
-            'nagpur': (21.1458, 79.0882),
-            'visakhapatnam': (17.6868, 83.2185), 'vizag': (17.6868, 83.2185),
-            'kochi': (9.9312, 76.2673), 'cochin': (9.9312, 76.2673),
-            'goa': (15.2993, 74.1240),
-            'bhubaneswar': (20.2961, 85.8245),
-            'thiruvananthapuram': (8.5241, 76.9366), 'trivandrum': (8.5241, 76.9366),
-            
-            # --- USA ---
-            'new york': (40.7128, -74.0060), 'nyc': (40.7128, -74.0060),
-            'los angeles': (34.0522, -118.2437), 'la': (34.0522, -118.2437),
-            'san francisco': (37.7749, -122.4194), 'sf': (37.7749, -122.4194),
-            'chicago': (41.8781, -87.6298),
-            'washington dc': (38.9072, -77.0369), 'dc': (38.9072, -77.0369),
-            'miami': (25.7617, -80.1918),
-            'las vegas': (36.1699, -115.1398), 'vegas': (36.1699, -115.1398),
-            'seattle': (47.6062, -122.3321),
-            'boston': (42.3601, -71.0589),
-            'houston': (29.7604, -95.3698),
-
-            # --- Europe ---
-            'london': (51.5074, -0.1278),
-            'paris': (48.8566, 2.3522),
-            'berlin': (52.5200, 13.4050),
-            'madrid': (40.4168, -3.7038),
-            'rome': (41.9028, 12.4964),
-            'amsterdam': (52.3676, 4.9041),
-            'zurich': (47.3769, 8.5417),
-            'moscow': (55.7558, 37.6173),
-            'istanbul': (41.0082, 28.9784),
-
-            # --- Asia ---
-            'tokyo': (35.6762, 139.6503),
-            'singapore': (1.3521, 103.8198),
-            'dubai': (25.2048, 55.2708),
-            'beijing': (39.9042, 116.4074),
-            'shanghai': (31.2304, 121.4737),
-            'hong kong': (22.3193, 114.1694), 'hk': (22.3193, 114.1694),
-            'bangkok': (13.7563, 100.5018),
-            'seoul': (37.5665, 126.9780),
-            'jakarta': (-6.2088, 106.8456),
-            
-            # --- Rest of World ---
-            'sydney': (-33.8688, 151.2093),
-            'melbourne': (-37.8136, 144.9631),
-            'toronto': (43.6510, -79.3470),
-            'vancouver': (49.2827, -123.1207),
-            'mexico city': (19.4326, -99.1332),
-            'rio de janeiro': (-22.9068, -43.1729), 'rio': (-22.9068, -43.1729),
-            'sao paulo': (-23.5505, -46.6333),
-            'cairo': (30.0444, 31.2357),
-            'johannesburg': (-26.2041, 28.0473),
-            'cape town': (-33.9249, 18.4241),
-        }
-        
-        loc_lower = location_input.lower().strip()
-        
-        if loc_lower in CITY_COORDS:
-            base_lat, base_long = CITY_COORDS[loc_lower]
-            # Add small noise for realism within city (0.02 deg ~ 2km)
-            lat = base_lat + random.uniform(-0.02, 0.02)
-            long = base_long + random.uniform(-0.02, 0.02)
+# Warm restart: restore the last snapshot, then keep snapshotting in the background.
+# Offline tools (replay.py) set YAKSHA_SNAPSHOTS=0 so they neither load nor overwrite it.
+snapshot_worker = SnapshotWorker(lambda: {'default': analyzer}, fusion_lock)
+
+def _handle_sigterm(signum, frame):
+    # Deploys stop the server with SIGTERM, whose default handler skips atexit
+    # and with it the final snapshot. Take it here, then exit normally.
+    snapshot_worker.stop()
+    sys.exit(0)
+
+if os.environ.get('YAKSHA_SNAPSHOTS', '1') != '0':
+    snapshot_worker.restore()
+    snapshot_worker.start()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+
+# --- Scoring Pipeline ---
+# Smart Geolocation (Mock Geocoding)
+CITY_COORDS = {
+    # --- India ---
+    'kolkata': (22.5726, 88.3639), 'calcutta': (22.5726, 88.3639),
+    'delhi': (28.7041, 77.1025), 'new delhi': (28.7041, 77.1025),
+    'mumbai': (19.0760, 72.8777), 'bombay': (19.0760, 72.8777),
+    'chennai': (13.0827, 80.2707), 'madras': (13.0827, 80.2707),
+    'bangalore': (12.9716, 77.5946), 'bengaluru': (12.9716, 77.5946),
+    'hyderabad': (17.3850, 78.4867),
+    'pune': (18.5204, 73.8567),
+    'ahmedabad': (23.0225, 72.5714),
+    'jaipur': (26.9124, 75.7873),
+    'surat': (21.1702, 72.8311),
+    'lucknow': (26.8467, 80.9462),
+    'kanpur': (26.4499, 80.3319),
+    'indore': (22.7196, 75.8577),
+    'bhopal': (23.2599, 77.4126),
+    'patna': (25.5941, 85.1376),
+    'vadodara': (22.3072, 73.1812),
+    'ghaziabad': (28.6692, 77.4538),
+    'ludhiana': (30.9010, 75.8573),
+    'agra': (27.1767, 78.0081),
+    'nashik': (19.9975, 73.7898),
+    'faridabad': (28.4089, 77.3178),
+    'meerut': (28.9845, 77.7064),
+    'rajkot': (22.3039, 70.8022),
+    'varanasi': (25.3176, 82.9739), 'banaras': (25.3176, 82.9739),
+    'srinagar': (34.0837, 74.7973),
+    'aurangabad': (19.8762, 75.3433),
+    'dhanbad': (23.7957, 86.4304),
+    'amritsar': (31.6340, 74.8723),
+    'allahabad': (25.4358, 81.8463), 'prayagraj': (25.4358, 81.8463),
+    'ranchi': (23.3441, 85.3096),
+    'coimbatore': (11.0168, 76.9558),
+    'jabalpur': (23.1815, 79.9864),
+    'gwalior': (26.2183, 78.1828),
+    'vijayawada': (16.5062, 80.6480),
+    'jodhpur': (26.2389, 73.0243),
+    'madurai': (9.9252, 78.1198),
+    'raipur': (21.2514, 81.6296),
+    'kota': (25.2138, 75.8648),
+    'guwahati': (26.1445, 91.7362),
+    'chandigarh': (30.7333, 76.7794),
+    'mysore': (12.2958, 76.6394),
+    'gurgaon': (28.4595, 77.0266), 'gurugram': (28.4595, 77.0266),
+    'noida': (28.5355, 77.3910),
+    'dehradun': (30.6340, 78.0297),
+    'nagpur': (21.1458, 79.0882),
+    'visakhapatnam': (17.6868, 83.2185), 'vizag': (17.6868, 83.2185),
+    'kochi': (9.9312, 76.2673), 'cochin': (9.9312, 76.2673),
+    'goa': (15.2993, 74.1240),
+    'bhubaneswar': (20.2961, 85.8245),
+    'thiruvananthapuram': (8.5241, 76.9366), 'trivandrum': (8.5241, 76.9366),
+    
+    # --- USA ---
+    'new york': (40.7128, -74.0060), 'nyc': (40.7128, -74.0060),
+    'los angeles': (34.0522, -118.2437), 'la': (34.0522, -118.2437),
+    'san francisco': (37.7749, -122.4194), 'sf': (37.7749, -122.4194),
+    'chicago': (41.8781, -87.6298),
+    'washington dc': (38.9072, -77.0369), 'dc': (38.9072, -77.0369),
+    'miami': (25.7617, -80.1918),
+    'las vegas': (36.1699, -115.1398), 'vegas': (36.1699, -115.1398),
+    'seattle': (47.6062, -122.3321),
+    'boston': (42.3601, -71.0589),
+    'houston': (29.7604, -95.3698),
+
+    # --- Europe ---
+    'london': (51.5074, -0.1278),
+    'paris': (48.8566, 2.3522),
+    'berlin': (52.5200, 13.4050),
+    'madrid': (40.4168, -3.7038),
+    'rome': (41.9028, 12.4964),
+    'amsterdam': (52.3676, 4.9041),
+    'zurich': (47.3769, 8.5417),
+    'moscow': (55.7558, 37.6173),
+    'istanbul': (41.0082, 28.9784),
+
+    # --- Asia ---
+    'tokyo': (35.6762, 139.6503),
+    'singapore': (1.3521, 103.8198),
+    'dubai': (25.2048, 55.2708),
+    'beijing': (39.9042, 116.4074),
+    'shanghai': (31.2304, 121.4737),
+    'hong kong': (22.3193, 114.1694), 'hk': (22.3193, 114.1694),
+    'bangkok': (13.7563, 100.5018),
+    'seoul': (37.5665, 126.9780),
+    'jakarta': (-6.2088, 106.8456),
+    
+    # --- Rest of World ---
+    'sydney': (-33.8688, 151.2093),
+    'melbourne': (-37.8136, 144.9631),
+    'toronto': (43.6510, -79.3470),
+    'vancouver': (49.2827, -123.1207),
+    'mexico city': (19.4326, -99.1332),
+    'rio de janeiro': (-22.9068, -43.1729), 'rio': (-22.9068, -43.1729),
+    'sao paulo': (-23.5505, -46.6333),
+    'cairo': (30.0444, 31.2357),
+    'johannesburg': (-26.2041, 28.0473),
+    'cape town': (-33.9249, 18.4241),
+}
+
+
+# Alias -> city as spelled in training ("bangalore" -> "Bengaluru"), so the
+# encoders and the feature store see the trained value.
+def _trained_city_names():
+    trained = [str(c) for c in encoders['city'].classes_] if 'city' in encoders else []
+    by_coords = {CITY_COORDS[c.lower()]: c for c in trained if c.lower() in CITY_COORDS}
+    return {alias: by_coords[coords] for alias, coords in CITY_COORDS.items() if coords in by_coords}
+
+trained_city_names = _trained_city_names()
+
+# LabelEncoder.transform() re-validates and rebuilds its class table on every
+# call; a plain dict gives the same codes (index into classes_) in O(1).
+encoder_tables = {
+    col: {str(cls): i for i, cls in enumerate(le.classes_)}
+    for col, le in encoders.items()
+}
+
+def get_encoded_value(col_name, val):
+    code = encoder_tables.get(col_name, {}).get(str(val))
+    if code is not None:
+        return code
+    # Unseen value: crc32 rather than hash(), which is salted per process
+    return zlib.crc32(str(val).encode('utf-8')) % 10000
+
+def _entity_stats(amount, merchant_stats, category_stats):
+    """Training fraud rates for the merchant/category and how unusual the amount is for the category."""
+    stats = {}
+    if merchant_stats:
+        stats['merchantFraudRate'] = merchant_stats['fraud_rate']
+        stats['merchantTransactions'] = int(merchant_stats['count'])
+    if category_stats:
+        stats['categoryFraudRate'] = category_stats['fraud_rate']
+        std = category_stats['amt_std']
+        stats['categoryAmountZ'] = round((amount - category_stats['amt_mean']) / std, 2) if std else 0.0
+    return stats
+
+def prepare_transaction(data):
+    """
+    Steps 1-2 of scoring: parse the /predict payload, geocode it and fill in
+    the entity features. Returns a dict with the model feature row.
+    """
+    # 1. Extract Frontend Data
+    amount = float(data.get('amount', 0))
+    merchant = data.get('merchant', 'unknown')
+    category = data.get('cardType', 'misc_net')  
+    location_input = data.get('location', 'Unknown, UNK')
+    time_str = data.get('time', '00:00')
+    date_str = data.get('date', datetime.now().strftime('%Y-%m-%d'))
+    
+    # Parse City/State from location
+    if ',' in location_input:
+        city, state = [x.strip() for x in location_input.split(',', 1)]
+    else:
+        city, state = location_input, "UNK"
+
+    # 2. Mock/Default Missing Features 
+    # Smart Lat/Long Generation based on History & Input
+    # This allows the user to DEMO the specific anomalies.
+    # Smart Geolocation (Mock Geocoding, see CITY_COORDS)
+    loc_lower = location_input.lower().strip()
+    if loc_lower not in CITY_COORDS and city.lower() in CITY_COORDS:
+        loc_lower = city.lower()  # "Mumbai, Maharashtra" -> "mumbai"
+    city = trained_city_names.get(loc_lower, city)
+    
+    if loc_lower in CITY_COORDS:
+        base_lat, base_long = CITY_COORDS[loc_lower]
+        # Add small noise for realism within city (0.02 deg ~ 2km)
+        lat = base_lat + random.uniform(-0.02, 0.02)
+        long = base_long + random.uniform(-0.02, 0.02)
+    else:
+        # Deterministic Random based on name hash (So "UnknownCity" always maps to same place)
+        # Use hash of string to seed
+        # (private generator, so the global random stream stays seedable)
+        seed_val = sum(ord(c) for c in loc_lower)
+        place_rng = random.Random(seed_val)
+        # Weighted towards India/Asia for demo probability
+        if seed_val % 2 == 0:
+            lat = place_rng.uniform(8, 32) # India Lat
+            long = place_rng.uniform(70, 90) # India Long
         else:
-            # Deterministic Random based on name hash (So "UnknownCity" always maps to same place)
-            # Use hash of string to seed
-            seed_val = sum(ord(c) for c in loc_lower)
-            random.seed(seed_val) 
-            # Weighted towards India/Asia for demo probability
-            if seed_val % 2 == 0:
-                lat = random.uniform(8, 32) # India Lat
-                long = random.uniform(70, 90) # India Long
-            else:
-                lat = random.uniform(-50, 60)
-                long = random.uniform(-120, 140)
-            random.seed() # Reset seed to clock
-
-        # Clamp values
-        lat = max(-90, min(90, lat))
-        long = max(-180, min(180, long))
-        
+            lat = place_rng.uniform(-50, 60)
+            long = place_rng.uniform(-120, 140)
+
+    # Clamp values
+    lat = max(-90, min(90, lat))
+    long = max(-180, min(180, long))
+    
+    # Entity features: real values from the feature store when the city was
+    # seen in training, placeholders otherwise. There is no merchant-only
+    # fallback for the merchant location: merchants trade in every city, so
+    # their average location says nothing about where this one is.
+    city_stats = feature_store.lookup('city', city) if feature_store else None
+
+    if city_stats:
+        # Per-transaction features are sampled from the city's (legitimate)
+        # training distribution; a per-city constant would score every
+        # transaction in the city alike.
+        merch_lat = lat + random.gauss(city_stats['merch_dlat_mean'], city_stats['merch_dlat_std'])
+        merch_long = long + random.gauss(city_stats['merch_dlong_mean'], city_stats['merch_dlong_std'])
+        city_pop = city_stats['city_pop']
+        job = feature_store.vocab_value('job', city_stats['job_code']) or "Engineer"
+        age = max(18, random.gauss(city_stats['age_mean'], city_stats['age_std']))
+    else:
         merch_lat = lat + random.uniform(-0.1, 0.1)
         merch_long = long + random.uniform(-0.1, 0.1)
         city_pop = random.randint(10000, 1000000)
-        job = "Engineer" 
+        job = "Engineer"
         age = random.uniform(18, 90)
-        trans_num = f"txn_{random.randint(100000, 999999)}"
-
-        # Date/Time Processing
-        try:
-            t = datetime.strptime(time_str, "%H:%M").time()
-            d = datetime.strptime(date_str, "%Y-%m-%d").date()
-            trans_dt = datetime.combine(d, t)
-        except:
-            trans_dt = datetime.now()
-        
-        trans_date_trans_time_unix = trans_dt.timestamp()
 
-        # 3. Model Logic
-        risk_score = 0
-        is_fraud = False
-        
-        if model:
-            # ... (Existing Model Code) ...
-            encoders = {}
-            if os.path.exists('encoders.pkl'):
-                try:
-                    encoders = joblib.load('encoders.pkl')
-                except:
-                    pass
-
-            def get_encoded_value(col_name, val):
-                if col_name in encoders:
-                    try:
-                        return encoders[col_name].transform([str(val)])[0]
-                    except:
-                        return abs(hash(val)) % 10000
-                else:
-                    return abs(hash(val)) % 10000
-
-            merchant_encoded = get_encoded_value('merchant', merchant)
-            category_encoded = get_encoded_value('category', category)
-            city_encoded = get_encoded_value('city', city)
-            state_encoded = get_encoded_value('state', state)
-            job_encoded = get_encoded_value('job', job)
-            trans_num_encoded = get_encoded_value('trans_num', trans_num)
-
-            features = np.array([[
-                amount, lat, long, city_pop, merch_lat, merch_long, 
-                merchant_encoded, category_encoded, city_encoded, state_encoded, 
-                job_encoded, trans_num_encoded, age, trans_date_trans_time_unix
-            ]])
-            
-            prediction = model.predict(features)[0]
-            is_fraud = bool(prediction)
-            
-            if hasattr(model, 'predict_proba'):
-                prob = model.predict_proba(features)[0][1] 
-                risk_score = int(prob * 100)
-            else:
-                risk_score = 95 if is_fraud else 5
+    # Historical context for the response (not a model input)
+    entity_stats = {}
+    if feature_store:
+        entity_stats = _entity_stats(amount, feature_store.lookup('merchant', merchant),
+                                     feature_store.lookup('category', category))
+
+    trans_num = f"txn_{random.randint(100000, 999999)}"
+
+    # Date/Time Processing
+    try:
+        t = datetime.strptime(time_str, "%H:%M").time()
+        d = datetime.strptime(date_str, "%Y-%m-%d").date()
+        trans_dt = datetime.combine(d, t)
+    except:
+        trans_dt = datetime.now()
+    
+    trans_date_trans_time_unix = trans_dt.timestamp()
 
+    features = None
+    categorical = {}
+    fallbacks = []
+    if model:
+        raw_values = {'merchant': merchant, 'category': category, 'city': city,
+                      'state': state, 'job': job, 'trans_num': trans_num}
+        fallbacks = [col for col, val in raw_values.items()
+                     if str(val) not in encoder_tables.get(col, {})]
+        merchant_encoded = get_encoded_value('merchant', merchant)
+        category_encoded = get_encoded_value('category', category)
+        city_encoded = get_encoded_value('city', city)
+        state_encoded = get_encoded_value('state', state)
+        job_encoded = get_encoded_value('job', job)
+        trans_num_encoded = get_encoded_value('trans_num', trans_num)
+
+        features = [
+            amount, lat, long, city_pop, merch_lat, merch_long, 
+            merchant_encoded, category_encoded, city_encoded, state_encoded, 
+            job_encoded, trans_num_encoded, age, trans_date_trans_time_unix
+        ]
+        categorical = {'merchant': merchant_encoded, 'category': category_encoded,
+                       'city': city_encoded, 'state': state_encoded, 'job': job_encoded}
+
+    return {
+        'amount': amount,
+        'merchant': merchant,
+        'location_input': location_input,
+        'lat': lat,
+        'long': long,
+        'trans_date_trans_time_unix': trans_date_trans_time_unix,
+        'features': features,
+        # For the drift monitor
+        'numeric': {'amount': amount, 'lat': lat, 'long': long, 'city_pop': city_pop, 'age': age},
+        'categorical': categorical,
+        'fallbacks': fallbacks,
+        'entity_stats': entity_stats,
+    }
+
+def score_transactions(batch, analyzers=None, record_drift=True):
+    """
+    Run transactions through the full scoring stack (geocoding, encoders,
+    model, behavioral fusion). The model is called once for the whole batch;
+    fusion then runs in order so each transaction sees the ones before it.
+    batch: list of /predict JSON payloads.
+    analyzers: optional list of BehavioralAnalyzer (one per payload, e.g. per
+    card); defaults to the global analyzer.
+    record_drift: feed the drift monitor; synthetic traffic (the generator,
+    replay.py) passes False so /drift only reflects real requests.
+    Returns a list of response dicts.
+    """
+    prepared = [prepare_transaction(data) for data in batch]
+
+    # 3. Model Logic
+    ml_results = []
+    if model:
+        features = np.array([p['features'] for p in prepared])
+
+        if hasattr(model, 'predict_proba'):
+            # One forest pass: predict() is just the argmax of predict_proba()
+            proba = model.predict_proba(features)
+            predictions = model.classes_[proba.argmax(axis=1)] if hasattr(model, 'classes_') else model.predict(features)
+            for prediction, prob in zip(predictions, proba[:, 1]):
+                ml_results.append((int(prob * 100), bool(prediction)))
         else:
+            for prediction in model.predict(features):
+                is_fraud = bool(prediction)
+                ml_results.append((95 if is_fraud else 5, is_fraud))
+
+    else:
+        for p in prepared:
             # Simulation Logic
-            if amount > 5000: risk_score += 40
-            if "online" in merchant.lower(): risk_score += 15
-            if location_input.lower() == "foreign": risk_score += 30
+            risk_score = 0
+            if p['amount'] > 5000: risk_score += 40
+            if "online" in p['merchant'].lower(): risk_score += 15
+            if p['location_input'].lower() == "foreign": risk_score += 30
             risk_score += random.randint(0, 20)
             if risk_score > 100: risk_score = 99
-            is_fraud = risk_score > 75
+            ml_results.append((risk_score, risk_score > 75))
+
+    if analyzers is None:
+        analyzers = [analyzer] * len(prepared)
+
+    responses = []
+    with fusion_lock:
+        for p, (risk_score, is_fraud), tx_analyzer in zip(prepared, ml_results, analyzers):
+            amount, lat, long = p['amount'], p['lat'], p['long']
+            trans_date_trans_time_unix = p['trans_date_trans_time_unix']
+            last_tx = tx_analyzer.history[-1] if tx_analyzer.history else None
+
+            # 4. Behavioral Analysis Fusion
+            # Analyze BEFORE adding current (or AFTER? usually current is checked against past)
+            # We check against past first.
+            behavioral_result = tx_analyzer.analyze(amount, lat, long, trans_date_trans_time_unix)
             
-        # 4. Behavioral Analysis Fusion
-        # Analyze BEFORE adding current (or AFTER? usually current is checked against past)
-        # We check against past first.
-        behavioral_result = analyzer.analyze(amount, lat, long, trans_date_trans_time_unix)
-        
-        # Update history
-        analyzer.add_transaction(amount, lat, long, trans_date_trans_time_unix)
-        
-        # Fuse Scores: Take the higher of ML score or Behavioral Score
-        final_risk_score = max(risk_score, behavioral_result['score'])
-        if final_risk_score > 75: is_fraud = True
-        
-        # Generate Response
-        response = {
-            'isFraud': is_fraud,
-            'riskScore': final_risk_score,
-            'mlScore': risk_score,
-            'behavioralScore': behavioral_result['score'],
-            'riskFactors': behavioral_result['factors'],
-            'details': behavioral_result['details'],
-            'locationData': {
-                'current': {'lat': lat, 'long': long},
-                'previous': {'lat': last_tx['lat'], 'long': last_tx['long']} if last_tx else None
-            },
-            'message': 'Analysis complete'
-        }
+            # Update history
+            tx_analyzer.add_transaction(amount, lat, long, trans_date_trans_time_unix)
+            
+            # Fuse Scores: Take the higher of ML score or Behavioral Score
+            final_risk_score = max(risk_score, behavioral_result['score'])
+            if final_risk_score > 75: is_fraud = True
+            
+            # Generate Response
+            responses.append({
+                'isFraud': is_fraud,
+                'riskScore': final_risk_score,
+                'mlScore': risk_score,
+                'behavioralScore': behavioral_result['score'],
+                'riskFactors': behavioral_result['factors'],
+                'details': behavioral_result['details'],
+                'entityStats': p['entity_stats'],
+                'locationData': {
+                    'current': {'lat': lat, 'long': long},
+                    'previous': {'lat': last_tx['lat'], 'long': last_tx['long']} if last_tx else None
+                },
+                'message': 'Analysis complete'
+            })
+
+    # The drift monitor has its own lock; keep it out of the fusion critical section
+    if record_drift:
+        for p, response in zip(prepared, responses):
+            drift_monitor.update(p['numeric'], p['categorical'], p['fallbacks'], {
+                'mlScore': response['mlScore'], 'behavioralScore': response['behavioralScore'],
+                'riskScore': response['riskScore'],
+            })
+    return responses
+
+def score_transaction(data, record_drift=True):
+    """
+    Score a single transaction. Used by /predict and by replay.py.
+    data: the /predict JSON payload. Returns the response dict.
+    """
+    return score_transactions([data], record_drift=record_drift)[0]
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    try:
+        data = request.json
+        print(f"Received data: {data}")
+
+        response = score_transaction(data)
         print(f"Result: {response}")
+        event_broker.publish([dict(response, amount=data.get('amount'), merchant=data.get('merchant'),
+                                   location=data.get('location'), source='predict')])
         return jsonify(response)
 
     except Exception as e:
@@ -498,6 +778,95 @@ def predict():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+# --- Live Traffic Stream ---
+# Scored transactions (from /predict and from the synthetic traffic generator)
+# are pushed to every open dashboard over Server-Sent Events at /stream.
+event_broker = EventBroker()
+
+def _generator_cities():
+    """
+    CITY_COORDS without aliases, the home cities the model was trained on and
+    their states (from the feature store).
+    """
+    trained = [str(c).lower() for c in encoders['city'].classes_] if 'city' in encoders else []
+    cities, seen = {}, set()
+    # Trained spellings first, so "bengaluru" (not the alias "bangalore") is kept
+    for name in trained + list(CITY_COORDS):
+        coords = CITY_COORDS.get(name)
+        if coords is not None and coords not in seen:
+            seen.add(coords)
+            cities[name] = coords
+    home = [c for c in trained if c in cities] or list(cities)
+    states = {}
+    for name in home:
+        stats = feature_store.lookup('city', name) if feature_store else None
+        state = feature_store.vocab_value('state', stats['state_code']) if stats and 'state_code' in stats else None
+        if state:
+            states[name] = state
+    return cities, home, states
+
+_cities, _home_cities, _home_states = _generator_cities()
+traffic_generator = TrafficGenerator(
+    score_fn=score_transactions,
+    publish_fn=event_broker.publish,
+    analyzer_factory=BehavioralAnalyzer,
+    cities=_cities,
+    home_cities=_home_cities,
+    states=_home_states,
+    merchants=[str(m) for m in encoders['merchant'].classes_] if 'merchant' in encoders else ['Amazon', 'Flipkart', 'Swiggy', 'Zomato', 'Uber'],
+    categories=[str(c) for c in encoders['category'].classes_] if 'category' in encoders else ['food', 'grocery', 'travel', 'electronics'],
+)
+
+@app.route('/stream')
+def stream():
+    """SSE feed of scored transactions for the dashboard."""
+    sub = event_broker.subscribe()
+    return Response(event_broker.stream(sub), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/traffic/start', methods=['POST'])
+def traffic_start():
+    try:
+        data = request.get_json(silent=True) or {}
+        traffic_generator.start(
+            rate=max(1, int(data.get('rate', 500))),
+            cards=max(1, int(data.get('cards', 2000))),
+            bursts_per_minute=max(0.0, float(data.get('burstsPerMinute', 6))),
+            time_scale=max(1.0, float(data.get('timeScale', 60))),
+            travel_probability=float(data.get('travelProbability', 0.002)),
+            seed=data.get('seed'),
+        )
+        print(f"Traffic generator started: {traffic_generator.config}")
+        return jsonify({'message': 'Traffic generator started', **traffic_generator.status()})
+    except Exception as e:
+        print(f"Traffic generator error: {e}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/traffic/stop', methods=['POST'])
+def traffic_stop():
+    traffic_generator.stop()
+    print("Traffic generator stopped.")
+    return jsonify({'message': 'Traffic generator stopped', **traffic_generator.status()})
+
+@app.route('/traffic/status')
+def traffic_status():
+    return jsonify({**traffic_generator.status(), 'stream': event_broker.stats()})
+
+@app.route('/drift')
+def drift():
+    """Live feature/score sketches and their drift against the training profile."""
+    return jsonify(drift_monitor.report())
+
+@app.route('/drift/reset', methods=['POST'])
+def drift_reset():
+    drift_monitor.reset()
+    return jsonify({'message': 'Drift sketches reset'})
+
+@app.route('/snapshot/status')
+def snapshot_status():
+    """Last analyzer snapshot and startup restore timings."""
+    return jsonify(snapshot_worker.stats)
+
 # ------------------------------------------------------------------------------
 # GOOGLE SHEETS INTEGRATION
 # ------------------------------------------------------------------------------
@@ -682,8 +1051,15 @@ def login():
         print(f"Login error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ------------------------------------------------------------------------------
+# PROFILING (opt-in, see request_profiler.py)
+# ------------------------------------------------------------------------------
+request_profiler = RequestProfiler.from_env()
+request_profiler.install(app)
+
 if __name__ == '__main__':
     print("Starting Flask Server...")
     print("Open http://localhost:5000 in your browser")
-    app.run(debug=True, port=5000)
+    # extra_files: restart on HTML/CSS/JS edits too (assets are cached in memory)
+    app.run(debug=True, port=5000, extra_files=static_assets.paths())
 
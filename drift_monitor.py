@@ -0,0 +1,287 @@
+import os
+import json
+import math
+import threading
+from bisect import bisect_left
+import numpy as np
+
+# ------------------------------------------------------------------------------
+# STREAMING DRIFT MONITOR
+# ------------------------------------------------------------------------------
+# Constant-memory sketches of what the model sees at serve time, compared with
+# a reference profile that train_model.py saves next to the model:
+#   - numeric features (amount, lat, long, city_pop, age): counts in fixed
+#     bins whose edges are the training quantiles. An update is one bisect over
+#     ~20 edges, live quantiles are interpolated from the bins, and the
+#     Population Stability Index (PSI) against training is exact per bin.
+#   - categorical features (encoded merchant/category/city/state/job IDs):
+#     Space-Saving heavy-hitter counters compared with the training shares,
+#     plus the share of traffic on values never seen in training.
+#   - encoder fallbacks: how often get_encoded_value() had to hash an unseen
+#     value (trans_num is a fresh id per transaction, so it always falls back).
+#   - score histograms for mlScore, behavioralScore and riskScore.
+
+DRIFT_REFERENCE_FILENAME = 'drift_reference.json'
+
+# live name -> training column
+NUMERIC_FEATURES = {
+    'amount': 'amt', 'lat': 'lat', 'long': 'long', 'city_pop': 'city_pop', 'age': 'age',
+}
+CATEGORICAL_FEATURES = {
+    'merchant': 'merchant_encoded', 'category': 'category_encoded', 'city': 'city_encoded',
+    'state': 'state_encoded', 'job': 'job_encoded',
+}
+ENCODED_COLUMNS = ['merchant', 'category', 'city', 'state', 'job', 'trans_num']
+SCORES = ['mlScore', 'behavioralScore', 'riskScore']
+
+QUANTILE_BINS = 20
+SCORE_BIN_WIDTH = 5
+HEAVY_HITTERS = 32
+REFERENCE_TOP_VALUES = 100
+
+# PSI rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 drift
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+# Share of a categorical column's traffic on values never seen in training
+UNSEEN_WARN = 0.05
+UNSEEN_DRIFT = 0.2
+# Below this many observations PSI/shares are noise ('insufficient-data')
+MIN_SAMPLES = 200
+
+# Used when no reference profile exists yet
+DEFAULT_EDGES = {
+    'amount': [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000],
+    'lat': list(range(-80, 90, 10)),
+    'long': list(range(-160, 180, 20)),
+    'city_pop': [1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 2e7],
+    'age': list(range(20, 100, 10)),
+}
+
+
+def _psi(expected, actual, eps=1e-4):
+    """Population Stability Index between two lists of proportions."""
+    return sum((a - e) * math.log((a + eps) / (e + eps)) for e, a in zip(expected, actual))
+
+
+def _status(value, count, warn=PSI_WARN, drift=PSI_DRIFT):
+    """Status of a PSI (or unseen share) measured over count observations."""
+    if count < MIN_SAMPLES:
+        return 'insufficient-data'
+    if value is None:
+        return 'no-reference'
+    if value >= drift:
+        return 'drift'
+    if value >= warn:
+        return 'warn'
+    return 'ok'
+
+
+class QuantileSketch:
+    """Fixed-edge histogram sketch; edges are the reference quantiles."""
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x):
+        self.counts[bisect_left(self.edges, x)] += 1
+        self.count += 1
+        self.total += x
+        if x < self.min: self.min = x
+        if x > self.max: self.max = x
+
+    def proportions(self):
+        return [c / self.count for c in self.counts] if self.count else [0.0] * len(self.counts)
+
+    def quantile(self, q):
+        """Interpolated quantile estimate (exact to within one bin)."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= target:
+                lo = self.edges[i - 1] if i > 0 else self.min
+                hi = self.edges[i] if i < len(self.edges) else self.max
+                lo, hi = max(lo, self.min), min(hi, self.max)
+                return lo + (hi - lo) * ((target - seen) / c)
+            seen += c
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99),
+        }
+
+
+class HeavyHitters:
+    """Space-Saving top-k counter: counts are overestimates by at most 'error'."""
+    def __init__(self, k=HEAVY_HITTERS):
+        self.k = k
+        self.counters = {}  # value -> [count, error]
+        self.count = 0
+
+    def update(self, value):
+        self.count += 1
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += 1
+        elif len(self.counters) < self.k:
+            self.counters[value] = [1, 0]
+        else:
+            # Evict the smallest counter (k is a small constant)
+            victim = min(self.counters, key=lambda v: self.counters[v][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[value] = [floor + 1, floor]
+
+    def top(self, n=10):
+        items = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [{'value': v, 'count': c, 'error': e} for v, (c, e) in items]
+
+
+class DriftMonitor:
+    def __init__(self, reference=None):
+        self.reference = reference
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        ref_numeric = (self.reference or {}).get('numeric', {})
+        with self._lock:
+            self.numeric = {
+                name: QuantileSketch(ref_numeric.get(name, {}).get('edges', DEFAULT_EDGES[name]))
+                for name in NUMERIC_FEATURES
+            }
+            self.categorical = {name: HeavyHitters() for name in CATEGORICAL_FEATURES}
+            self.fallbacks = {col: 0 for col in ENCODED_COLUMNS}
+            self.score_counts = {name: [0] * (100 // SCORE_BIN_WIDTH + 1) for name in SCORES}
+            self.count = 0
+
+    def update(self, numeric, categorical, fallback_columns, scores):
+        """
+        Record one scored transaction. O(1): a bisect per numeric feature and a
+        dict update per categorical one.
+        numeric: {name: value}, categorical: {name: encoded id} (may be empty),
+        fallback_columns: columns that missed their encoder, scores: {name: 0-100}
+        """
+        with self._lock:
+            self.count += 1
+            for name, value in numeric.items():
+                self.numeric[name].update(float(value))
+            for name, value in categorical.items():
+                self.categorical[name].update(int(value))
+            for col in fallback_columns:
+                self.fallbacks[col] += 1
+            for name, value in scores.items():
+                self.score_counts[name][min(int(value), 100) // SCORE_BIN_WIDTH] += 1
+
+    def report(self):
+        ref = self.reference or {}
+        with self._lock:
+            numeric = {}
+            for name, sketch in self.numeric.items():
+                ref_props = ref.get('numeric', {}).get(name, {}).get('proportions')
+                psi = _psi(ref_props, sketch.proportions()) if ref_props and sketch.count else None
+                numeric[name] = {**sketch.summary(), 'psi': psi, 'status': _status(psi, sketch.count),
+                                 'reference': ref.get('numeric', {}).get(name, {}).get('summary')}
+
+            categorical = {}
+            for name, hh in self.categorical.items():
+                ref_shares = ref.get('categorical', {}).get(name, {}).get('shares', {})
+                top = hh.top()
+                for entry in top:
+                    entry['share'] = entry['count'] / hh.count
+                    entry['referenceShare'] = ref_shares.get(str(entry['value']), 0.0) if ref_shares else None
+                # Unseen values are exactly the encoder fallbacks for this column
+                unseen = self.fallbacks[name] / hh.count if hh.count else None
+                categorical[name] = {
+                    'count': hh.count,
+                    'top': top,
+                    'unseenShare': unseen,
+                    'status': 'no-data' if unseen is None else _status(unseen, hh.count, UNSEEN_WARN, UNSEEN_DRIFT),
+                }
+
+            fallback_rates = {col: (n / self.count if self.count else 0.0) for col, n in self.fallbacks.items()}
+
+            scores = {}
+            for name, counts in self.score_counts.items():
+                total = sum(counts)
+                props = [c / total for c in counts] if total else None
+                ref_props = ref.get('scores', {}).get(name)
+                psi = _psi(ref_props, props) if ref_props and props else None
+                scores[name] = {'binWidth': SCORE_BIN_WIDTH, 'histogram': counts, 'psi': psi,
+                                'status': _status(psi, total)}
+
+            return {
+                'transactions': self.count,
+                'minSamples': MIN_SAMPLES,
+                'hasReference': bool(ref),
+                'numeric': numeric,
+                'categorical': categorical,
+                'fallbackRates': fallback_rates,
+                'scores': scores,
+            }
+
+
+# ------------------------------------------------------------------------------
+# REFERENCE PROFILE (train time)
+# ------------------------------------------------------------------------------
+
+def _score_proportions(scores):
+    counts = np.bincount(np.minimum(np.asarray(scores, dtype=int), 100) // SCORE_BIN_WIDTH,
+                         minlength=100 // SCORE_BIN_WIDTH + 1)
+    return (counts / max(counts.sum(), 1)).tolist()
+
+
+def build_reference_profile(df, ml_scores=None):
+    """
+    Profile of the training features (same columns as the model input).
+    ml_scores: optional held-out mlScore values (0-100) for the score reference.
+    """
+    profile = {'rows': int(len(df)), 'numeric': {}, 'categorical': {}, 'scores': {}}
+
+    for name, col in NUMERIC_FEATURES.items():
+        values = df[col].astype(float).to_numpy()
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, QUANTILE_BINS + 1)[1:-1]))
+        idx = np.searchsorted(edges, values, side='left')  # same binning as bisect_left
+        counts = np.bincount(idx, minlength=len(edges) + 1)
+        profile['numeric'][name] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / len(values)).tolist(),
+            'summary': {
+                'mean': float(values.mean()), 'min': float(values.min()), 'max': float(values.max()),
+                'p50': float(np.quantile(values, 0.5)), 'p90': float(np.quantile(values, 0.9)),
+                'p99': float(np.quantile(values, 0.99)),
+            },
+        }
+
+    for name, col in CATEGORICAL_FEATURES.items():
+        shares = df[col].astype(int).value_counts(normalize=True)
+        profile['categorical'][name] = {
+            'cardinality': int(len(shares)),
+            # Only the most common values: enough to compare heavy hitters
+            'shares': {str(k): float(v) for k, v in shares.head(REFERENCE_TOP_VALUES).items()},
+        }
+
+    if ml_scores is not None:
+        profile['scores']['mlScore'] = _score_proportions(ml_scores)
+    return profile
+
+
+def save_reference_profile(profile, path=DRIFT_REFERENCE_FILENAME):
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+
+
+def load_reference_profile(path=DRIFT_REFERENCE_FILENAME):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
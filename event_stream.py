@@ -0,0 +1,94 @@
+import json
+import threading
+from collections import deque
+
+# ------------------------------------------------------------------------------
+# SERVER-SENT EVENTS BROKER
+# ------------------------------------------------------------------------------
+# Fans scored transactions out to every connected dashboard over /stream.
+# Each client gets its own bounded buffer: if a browser can't keep up, the
+# oldest undelivered events are dropped (and counted) instead of growing
+# memory or slowing down the scoring thread that publishes them.
+
+
+class Subscription:
+    """One connected /stream client."""
+    def __init__(self, buffer_size):
+        self.buffer = deque(maxlen=buffer_size)
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.delivered = 0
+
+
+class EventBroker:
+    def __init__(self, buffer_size=2000, max_batch=500, heartbeat_seconds=15):
+        self.buffer_size = buffer_size
+        self.max_batch = max_batch
+        self.heartbeat_seconds = heartbeat_seconds
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        sub = Subscription(self.buffer_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, events):
+        """Queue a list of JSON-serializable events for every subscriber."""
+        if not events or not self._subscribers:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            with sub.cond:
+                overflow = len(sub.buffer) + len(events) - self.buffer_size
+                if overflow > 0:
+                    sub.dropped += overflow
+                sub.buffer.extend(events)
+                sub.cond.notify()
+
+    def stream(self, sub):
+        """
+        Generator of SSE frames for one client. Sends up to max_batch events
+        per frame, plus a comment heartbeat so proxies keep the connection open.
+        """
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                with sub.cond:
+                    if not sub.buffer:
+                        sub.cond.wait(self.heartbeat_seconds)
+                    batch = []
+                    while sub.buffer and len(batch) < self.max_batch:
+                        batch.append(sub.buffer.popleft())
+                    dropped = sub.dropped
+
+                if not batch:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                sub.delivered += len(batch)
+                payload = json.dumps({'events': batch, 'dropped': dropped})
+                yield f"event: transactions\ndata: {payload}\n\n"
+        finally:
+            # Client disconnected (or server shutting down)
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'clients': len(subscribers),
+            'bufferSize': self.buffer_size,
+            'buffered': sum(len(s.buffer) for s in subscribers),
+            'dropped': sum(s.dropped for s in subscribers),
+            'delivered': sum(s.delivered for s in subscribers),
+        }
@@ -0,0 +1,219 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------------------------
+# FEATURE STORE
+# ------------------------------------------------------------------------------
+# Per-merchant, per-category and per-city aggregates computed from the training
+# CSV by train_model.py and looked up by app.py at serve time.
+#
+# Each table is stored as three .npy files inside FEATURE_STORE_DIR:
+#   <table>_values.npy  float64 [n_rows, n_columns]  the aggregates
+#   <table>_keys.npy    bytes   [n_rows]             the normalized entity keys
+#   <table>_slots.npy   int64   [capacity]           open-addressing hash index
+# plus a meta.json describing the columns and any small vocabularies (e.g. job).
+# Everything is opened with mmap_mode='r', so only the pages touched by a
+# lookup are read from disk and the store can hold millions of entities.
+
+FEATURE_STORE_DIR = 'feature_store'
+META_FILENAME = 'meta.json'
+
+# Columns per table (order matters, it is the layout of <table>_values.npy)
+TABLE_COLUMNS = {
+    'merchant': ['count', 'fraud_rate', 'amt_mean', 'amt_std'],
+    'category': ['count', 'fraud_rate', 'amt_mean', 'amt_std'],
+    'city': ['count', 'fraud_rate', 'amt_mean', 'amt_std', 'city_pop', 'age_mean', 'age_std',
+             'lat', 'long', 'job_code', 'state_code',
+             'merch_dlat_mean', 'merch_dlat_std', 'merch_dlong_mean', 'merch_dlong_std'],
+}
+
+
+def normalize_key(value):
+    """Keys are matched case-insensitively and without surrounding spaces."""
+    return str(value).strip().lower().encode('utf-8')
+
+
+def _hash_key(key_bytes):
+    # Stable across processes (unlike hash()), so the index built at train
+    # time is valid at serve time.
+    return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little')
+
+
+def _build_slots(keys):
+    """Build a linear-probing index (load factor <= 0.5) mapping key -> row."""
+    capacity = 1
+    while capacity < 2 * max(len(keys), 1):
+        capacity *= 2
+    mask = capacity - 1
+    slots = np.full(capacity, -1, dtype=np.int64)
+    for row, key in enumerate(keys):
+        i = _hash_key(key) & mask
+        while slots[i] != -1:
+            i = (i + 1) & mask
+        slots[i] = row
+    return slots
+
+
+class FeatureTable:
+    """One memory-mapped aggregate table with an O(1) key index."""
+    def __init__(self, name, columns, values, keys, slots):
+        self.name = name
+        self.columns = columns
+        # Plain ndarray views over the mapped buffers: same pages, but indexing
+        # skips the np.memmap subclass overhead on every lookup.
+        self.values = np.asarray(values)
+        self.keys = np.asarray(keys)
+        self.slots = np.asarray(slots)
+        self._mask = len(slots) - 1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row_index(self, key):
+        """Return the row index for key, or -1 if the entity was never seen."""
+        key_bytes = normalize_key(key)
+        slots = self.slots
+        i = _hash_key(key_bytes) & self._mask
+        while True:
+            row = int(slots[i])
+            if row == -1:
+                return -1
+            if self.keys[row] == key_bytes:
+                return row
+            i = (i + 1) & self._mask
+
+    def lookup(self, key):
+        """Return {column: value} for key, or None if the entity is unknown."""
+        row = self.row_index(key)
+        if row == -1:
+            return None
+        return dict(zip(self.columns, self.values[row].tolist()))
+
+
+class FeatureStore:
+    """Collection of FeatureTables plus the vocabularies they reference."""
+    def __init__(self, tables, vocab):
+        self.tables = tables
+        self.vocab = vocab
+
+    def lookup(self, table, key):
+        t = self.tables.get(table)
+        return t.lookup(key) if t is not None else None
+
+    def vocab_value(self, name, code):
+        values = self.vocab.get(name, [])
+        code = int(code)
+        return values[code] if 0 <= code < len(values) else None
+
+
+# ------------------------------------------------------------------------------
+# BUILD (train time)
+# ------------------------------------------------------------------------------
+
+def _aggregate(df, key_col, target_col, extra_means):
+    """Group df by key_col and compute count, fraud rate, amount stats and means."""
+    keys = df[key_col].astype(str).str.strip().str.lower()
+    grouped = df.assign(_key=keys).groupby('_key', sort=True)
+    agg = grouped.agg(
+        count=('amt', 'size'),
+        fraud_rate=(target_col, 'mean'),
+        amt_mean=('amt', 'mean'),
+        amt_std=('amt', 'std'),
+        **{name: (col, 'mean') for name, col in extra_means.items()}
+    )
+    # Single-transaction entities have an undefined std
+    agg['amt_std'] = agg['amt_std'].fillna(0.0)
+    return agg
+
+
+def _write_table(out_dir, name, agg):
+    columns = TABLE_COLUMNS[name]
+    values = agg[columns].to_numpy(dtype=np.float64)
+    key_list = [k.encode('utf-8') for k in agg.index]
+    keys = np.array(key_list, dtype=f'S{max((len(k) for k in key_list), default=1)}')
+    slots = _build_slots(key_list)
+
+    np.save(os.path.join(out_dir, f'{name}_values.npy'), values)
+    np.save(os.path.join(out_dir, f'{name}_keys.npy'), keys)
+    np.save(os.path.join(out_dir, f'{name}_slots.npy'), slots)
+    print(f"  {name}: {len(key_list)} entities")
+
+
+def build_feature_store(df, target_col, out_dir=FEATURE_STORE_DIR):
+    """
+    Compute the aggregate tables from a preprocessed training frame.
+    Expects 'amt', target_col, 'city_pop', 'age', 'lat', 'long',
+    'merch_lat', 'merch_long' and the raw 'merchant', 'category', 'city', 'state', 'job' columns.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = df.copy()
+    df[target_col] = df[target_col].astype(float)
+
+    merchants = _aggregate(df, 'merchant', target_col, {})
+    _write_table(out_dir, 'merchant', merchants)
+
+    categories = _aggregate(df, 'category', target_col, {})
+    _write_table(out_dir, 'category', categories)
+
+    # Most common job and state per city, stored as codes into the 'job' and
+    # 'state' vocabularies
+    vocab = {}
+    for col in ('job', 'state'):
+        vocab[col] = sorted(df[col].astype(str).unique())
+        codes = {value: i for i, value in enumerate(vocab[col])}
+        df[f'{col}_code'] = df[col].astype(str).map(codes)
+    cities = _aggregate(df, 'city', target_col, {
+        'city_pop': 'city_pop', 'age_mean': 'age', 'lat': 'lat', 'long': 'long',
+    })
+    city_keys = df['city'].astype(str).str.strip().str.lower()
+    by_city = df.groupby(city_keys)
+    for col in ('job_code', 'state_code'):
+        cities[col] = by_city[col].agg(lambda s: s.mode().iloc[0])
+    cities['age_std'] = by_city['age'].std().fillna(0.0)
+
+    # Offset of the merchant from the customer, so serve time can sample a
+    # per-transaction merchant location. Only legitimate rows count: fraud
+    # merchants sit far away, and mixing them in would leak the label into
+    # every transaction of the city.
+    honest = df[df[target_col] == 0]
+    honest_offsets = pd.DataFrame({
+        'dlat': honest['merch_lat'] - honest['lat'],
+        'dlong': honest['merch_long'] - honest['long'],
+    }).groupby(city_keys[honest.index])
+    for col in ('dlat', 'dlong'):
+        cities[f'merch_{col}_mean'] = honest_offsets[col].mean()
+        cities[f'merch_{col}_std'] = honest_offsets[col].std()
+    offset_columns = ['merch_dlat_mean', 'merch_dlat_std', 'merch_dlong_mean', 'merch_dlong_std']
+    cities[offset_columns] = cities[offset_columns].fillna(0.0)
+    _write_table(out_dir, 'city', cities)
+
+    meta = {'tables': TABLE_COLUMNS, 'vocab': vocab}
+    with open(os.path.join(out_dir, META_FILENAME), 'w') as f:
+        json.dump(meta, f, indent=4)
+
+
+# ------------------------------------------------------------------------------
+# LOAD (serve time)
+# ------------------------------------------------------------------------------
+
+def load_feature_store(store_dir=FEATURE_STORE_DIR):
+    """Memory-map every table in store_dir. Returns None if no store was built."""
+    meta_path = os.path.join(store_dir, META_FILENAME)
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+
+    tables = {}
+    for name, columns in meta['tables'].items():
+        tables[name] = FeatureTable(
+            name, columns,
+            np.load(os.path.join(store_dir, f'{name}_values.npy'), mmap_mode='r'),
+            np.load(os.path.join(store_dir, f'{name}_keys.npy'), mmap_mode='r'),
+            np.load(os.path.join(store_dir, f'{name}_slots.npy'), mmap_mode='r'),
+        )
+    return FeatureStore(tables, meta.get('vocab', {}))
@@ -0,0 +1,251 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import random
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+# ------------------------------------------------------------------------------
+# EVENT-TIME REPLAY SIMULATOR
+# ------------------------------------------------------------------------------
+# Streams a transaction CSV (same layout as the training CSV) through the full
+# in-process scoring stack in app.py - geocoding, encoders, model, the
+# BehavioralAnalyzer fusion and the final_risk_score > 75 threshold - in
+# trans_date_trans_time order, and reports throughput, latency percentiles,
+# analyzer state growth and precision/recall against is_fraud.
+#
+# The CSV has no card number, so each customer (dob + job + city) gets its own
+# BehavioralAnalyzer; unrelated customers must not look like one card jumping
+# between cities.
+#
+# Usage:
+#   python replay.py                                   # as fast as possible
+#   python replay.py --speedup 86400                   # 1 day of events per second
+#   python replay.py --scale 20 --limit 50000          # scaled-up synthetic stream
+
+DEFAULT_CSV = 'credit_card_fraud_realistic_1000.csv'
+
+
+def load_stream(csv_path, scale=1, seed=42):
+    """
+    Load the CSV and return it sorted by event time.
+    With scale > 1, every row is cloned scale-1 extra times with its timestamp
+    jittered by up to +/- 12 hours, giving a larger stream with the same mix.
+    """
+    df = pd.read_csv(csv_path)
+    df['trans_date_trans_time'] = pd.to_datetime(df['trans_date_trans_time'])
+
+    if scale > 1:
+        rng = np.random.default_rng(seed)
+        clones = pd.concat([df] * (scale - 1), ignore_index=True)
+        jitter = rng.integers(-12 * 3600, 12 * 3600, size=len(clones))
+        clones['trans_date_trans_time'] += pd.to_timedelta(jitter, unit='s')
+        df = pd.concat([df, clones], ignore_index=True)
+
+    return df.sort_values('trans_date_trans_time', kind='stable').reset_index(drop=True)
+
+
+def customer_key(row):
+    """Proxy for the card holder: the CSV has no card or customer id."""
+    return (str(row.get('dob', '')), str(row.get('job', '')), str(row.get('city', '')))
+
+
+def row_to_payload(row):
+    """
+    Build the same JSON payload the dashboard sends to /predict. The location
+    is "City, State" (as a user may type it) so the model gets the real state
+    instead of the "UNK" placeholder.
+    """
+    ts = row['trans_date_trans_time']
+    location = f"{row['city']}, {row['state']}" if 'state' in row else str(row['city'])
+    return {
+        'amount': float(row['amt']),
+        'merchant': str(row['merchant']),
+        'cardType': str(row['category']),
+        'location': location,
+        'date': ts.strftime('%Y-%m-%d'),
+        'time': ts.strftime('%H:%M'),
+    }
+
+
+def _deep_sizeof(obj, seen=None):
+    """Approximate retained size in bytes of a container and its contents."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(x, seen) for x in obj)
+    elif hasattr(obj, '__dict__'):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
+def _percentiles_ms(latencies):
+    if not latencies:
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    arr = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {'p50': p50, 'p90': p90, 'p99': p99, 'max': arr.max()}
+
+
+def replay(df, score_fn, analyzer_factory, speedup=0.0, windows=10):
+    """
+    Drive score_fn(payload, analyzer) over df in event-time order, with one
+    analyzer_factory() analyzer per customer (see customer_key).
+    speedup: event seconds per wall second (0 = as fast as possible).
+    Returns a dict of run metrics.
+    """
+    n = len(df)
+    window_size = max(1, n // windows)
+    latencies = []
+    window_stats = []
+    analyzers = {}
+    state_samples = [(0, 0)]
+    tp = fp = fn = tn = errors = 0
+
+    first_event = df['trans_date_trans_time'].iloc[0] if n else None
+
+    gc.collect()
+    start = time.perf_counter()
+    window_start = start
+    window_first_row = 0
+    window_first_latency = 0
+
+    for i, row in enumerate(df.itertuples(index=False)):
+        row = row._asdict()
+
+        if speedup > 0:
+            due = (row['trans_date_trans_time'] - first_event) / timedelta(seconds=1) / speedup
+            wait = due - (time.perf_counter() - start)
+            if wait > 0:
+                time.sleep(wait)
+
+        payload = row_to_payload(row)
+        key = customer_key(row)
+        analyzer = analyzers.get(key)
+        if analyzer is None:
+            analyzer = analyzers[key] = analyzer_factory()
+        t0 = time.perf_counter()
+        try:
+            result = score_fn(payload, analyzer)
+        except Exception as e:
+            errors += 1
+            print(f"Replay error on row {i}: {e}")
+            result = None
+        else:
+            latencies.append(time.perf_counter() - t0)
+
+        if result is not None:
+            predicted = bool(result['isFraud'])
+            actual = bool(row.get('is_fraud', 0))
+            if predicted and actual: tp += 1
+            elif predicted: fp += 1
+            elif actual: fn += 1
+            else: tn += 1
+
+        if (i + 1) % window_size == 0 or i + 1 == n:
+            now = time.perf_counter()
+            window_stats.append({
+                'rows': (window_first_row, i + 1),
+                'throughput': (len(latencies) - window_first_latency) / max(now - window_start, 1e-9),
+                **_percentiles_ms(latencies[window_first_latency:]),
+            })
+            # Sampled per window: sizing every analyzer is O(customers)
+            state_samples.append((i + 1, _deep_sizeof(analyzers)))
+            window_start = time.perf_counter()
+            window_first_row = i + 1
+            window_first_latency = len(latencies)
+
+    elapsed = time.perf_counter() - start
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'transactions': n,
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'latency_ms': _percentiles_ms(latencies),
+        'windows': window_stats,
+        'state_bytes': state_samples,
+        'customers': len(analyzers),
+        'confusion': {'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn},
+        'precision': precision,
+        'recall': recall,
+    }
+
+
+def print_report(metrics):
+    lat = metrics['latency_ms']
+    print("\n" + "=" * 70)
+    print("REPLAY REPORT")
+    print("=" * 70)
+    print(f"Transactions : {metrics['transactions']} ({metrics['errors']} errors)")
+    print(f"Elapsed      : {metrics['elapsed_s']:.2f} s")
+    print(f"Throughput   : {metrics['throughput']:.1f} tx/s (sustained)")
+    print(f"Latency (ms) : p50={lat['p50']:.3f} p90={lat['p90']:.3f} "
+          f"p99={lat['p99']:.3f} max={lat['max']:.3f}")
+
+    print("\nPer-window (look for throughput dropping as state grows):")
+    for w in metrics['windows']:
+        lo, hi = w['rows']
+        print(f"  rows {lo:>7}-{hi:<7} {w['throughput']:>9.1f} tx/s  "
+              f"p50={w['p50']:.3f} p99={w['p99']:.3f} ms")
+
+    samples = metrics['state_bytes']
+    start_b, end_b = samples[0][1], samples[-1][1]
+    peak_b = max(b for _, b in samples)
+    print(f"\nAnalyzer state: {metrics['customers']} customers, start={start_b} B end={end_b} B "
+          f"peak={peak_b} B growth={end_b - start_b:+d} B")
+
+    c = metrics['confusion']
+    print(f"\nConfusion    : TP={c['tp']} FP={c['fp']} FN={c['fn']} TN={c['tn']}")
+    print(f"Precision    : {metrics['precision']:.2%}")
+    print(f"Recall       : {metrics['recall']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a transaction CSV through the Yaksha scoring stack.")
+    parser.add_argument('csv', nargs='?', default=DEFAULT_CSV, help=f"transaction CSV (default: {DEFAULT_CSV})")
+    parser.add_argument('--speedup', type=float, default=0.0,
+                        help="event seconds per wall second; 0 = as fast as possible (default)")
+    parser.add_argument('--scale', type=int, default=1,
+                        help="clone each row this many times with jittered timestamps")
+    parser.add_argument('--limit', type=int, default=0, help="replay only the first N events")
+    parser.add_argument('--windows', type=int, default=10, help="number of per-window report lines")
+    parser.add_argument('--seed', type=int, default=42, help="seed for synthetic scaling and scoring noise (runs with the same seed are identical)")
+    args = parser.parse_args()
+
+    print(f"Loading {args.csv} (scale x{args.scale})...")
+    df = load_stream(args.csv, scale=args.scale, seed=args.seed)
+    if args.limit:
+        df = df.head(args.limit)
+    print(f"Loaded {len(df)} events from {df['trans_date_trans_time'].iloc[0]} "
+          f"to {df['trans_date_trans_time'].iloc[-1]}.")
+
+    # Import late so the model/encoders/feature store load after argument errors.
+    # Don't restore or overwrite the server's analyzer snapshot.
+    os.environ['YAKSHA_SNAPSHOTS'] = '0'
+    import app
+
+    random.seed(args.seed)
+    print("Replaying...")
+    # Replayed history must not show up as live drift on /drift
+    def score_fn(payload, analyzer):
+        return app.score_transactions([payload], [analyzer], record_drift=False)[0]
+
+    metrics = replay(df, score_fn, app.BehavioralAnalyzer,
+                     speedup=args.speedup, windows=args.windows)
+    print_report(metrics)
+
+
+if __name__ == "__main__":
+    main()
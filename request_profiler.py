@@ -0,0 +1,236 @@
+import os
+import sys
+import hmac
+import time
+import random
+import marshal
+import cProfile
+import itertools
+import threading
+from collections import deque
+from flask import request, g, jsonify, Response
+from feature_store import FeatureStore
+from drift_monitor import DriftMonitor
+
+# ------------------------------------------------------------------------------
+# ON-DEMAND REQUEST PROFILER
+# ------------------------------------------------------------------------------
+# Opt-in cProfile hook for the Flask routes, configured with environment variables:
+#   YAKSHA_PROFILE_TOKEN        secret; requests sending it in the
+#                               X-Yaksha-Profile header are profiled, and it is
+#                               required for the /admin/profiles endpoints
+#   YAKSHA_PROFILE_SAMPLE_RATE  fraction of requests to profile (default 0)
+#   YAKSHA_PROFILE_RING_SIZE    how many recent profiles to keep (default 50)
+#
+# With no token and a zero sample rate no request hooks are registered at all,
+# so a disabled profiler adds no per-request work.
+#
+# Only one request is profiled at a time; a request that arrives while another
+# is being profiled is simply served unprofiled. On Python 3.12+ cProfile sees
+# every thread (e.g. the traffic generator), so there the profile and its
+# stages cover the whole process for the request's duration; each profile
+# records this as 'allThreads'.
+#
+# Each stored profile has a per-stage breakdown of the scoring pipeline (taken
+# from the profile itself, so the hot path carries no timers) and can be
+# downloaded as a .prof file for pstats / snakeviz:
+#   GET /admin/profiles              recent profiles (summaries)
+#   GET /admin/profiles/<id>         stages + top functions
+#   GET /admin/profiles/<id>.prof    raw profile
+
+# cProfile only follows the thread that enabled it before Python 3.12
+PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+
+PROFILE_HEADER = 'X-Yaksha-Profile'
+ADMIN_PREFIX = '/admin/profiles'
+TOP_FUNCTIONS = 25
+
+def _code_key(func):
+    """The pstats key (filename, lineno, funcname) of a Python function."""
+    code = func.__code__
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+# Stage name -> predicate on a pstats key (filename, lineno, funcname). Each
+# stage reports the matching function with the largest cumulative time (the
+# outermost call, e.g. the forest's predict_proba rather than each tree's).
+STAGES = {
+    'prepare_transaction': lambda f, line, n: n == 'prepare_transaction' and f.endswith('app.py'),
+    'geocode_fallback_reseed': lambda f, line, n: n == 'seed' and f.endswith('random.py'),
+    'feature_store_lookup': lambda *key: key == _code_key(FeatureStore.lookup),
+    'get_encoded_value': lambda f, line, n: n == 'get_encoded_value' and f.endswith('app.py'),
+    'model': lambda f, line, n: n in ('predict_proba', 'predict') and not f.endswith('app.py'),
+    'behavioral_analyze': lambda f, line, n: n == 'analyze' and f.endswith('app.py'),
+    'drift_update': lambda *key: key == _code_key(DriftMonitor.update),
+    'chatbot': lambda f, line, n: n == 'get_response' and f.endswith('app.py'),
+    'jsonify': lambda f, line, n: n == 'jsonify',
+}
+
+
+def _stage_breakdown(stats):
+    stages = {}
+    for name, matches in STAGES.items():
+        entries = [(ct, nc) for key, (_, nc, _, ct, _) in stats.items() if matches(*key)]
+        if entries:
+            ct, nc = max(entries)
+            stages[name] = {'ms': round(ct * 1000, 3), 'calls': nc}
+    return stages
+
+
+def _top_functions(stats, n=TOP_FUNCTIONS):
+    rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:n]
+    return [{
+        'function': f"{os.path.basename(f)}:{line}({func})",
+        'ncalls': nc, 'tottime_ms': round(tt * 1000, 3), 'cumtime_ms': round(ct * 1000, 3),
+    } for (f, line, func), (_, nc, tt, ct, _) in rows]
+
+
+class RequestProfiler:
+    def __init__(self, token=None, sample_rate=0.0, ring_size=50):
+        self.token = token or None
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.profiles = deque(maxlen=ring_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Held while a request is being profiled (3.12+ allows one profiler per process)
+        self._active = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            token=os.environ.get('YAKSHA_PROFILE_TOKEN'),
+            sample_rate=float(os.environ.get('YAKSHA_PROFILE_SAMPLE_RATE', '0') or 0),
+            ring_size=int(os.environ.get('YAKSHA_PROFILE_RING_SIZE', '50') or 50),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.token) or self.sample_rate > 0
+
+    def install(self, app):
+        """Register the hooks and admin routes on app (no-op when disabled)."""
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule(ADMIN_PREFIX, 'profiles_list', self._list)
+        app.add_url_rule(f'{ADMIN_PREFIX}/<int:profile_id>', 'profiles_detail', self._detail)
+        app.add_url_rule(f'{ADMIN_PREFIX}/<int:profile_id>.prof', 'profiles_export', self._export)
+        print(f"Request profiler enabled (sample rate {self.sample_rate}, "
+              f"header {'on' if self.token else 'off'}, keeping {self.profiles.maxlen}).")
+
+    # --------------------------------------------------------------------------
+    # Hooks
+    # --------------------------------------------------------------------------
+
+    def _authorized(self):
+        supplied = request.headers.get(PROFILE_HEADER)
+        return bool(self.token and supplied and hmac.compare_digest(supplied, self.token))
+
+    def _before_request(self):
+        # Never profile the admin endpoints or the long-lived SSE stream
+        if request.path.startswith(ADMIN_PREFIX) or request.path == '/stream':
+            return
+        if self._authorized():
+            trigger = 'header'
+        elif self.sample_rate and random.random() < self.sample_rate:
+            trigger = 'sample'
+        else:
+            return
+        if not self._active.acquire(blocking=False):
+            return  # another request is being profiled
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (e.g. a debugger) is active; never fail the request
+            self._active.release()
+            return
+        g.profile_trigger = trigger
+        g.profile_started = time.perf_counter()
+        g.profiler = profiler
+
+    def _after_request(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        self._active.release()
+        try:
+            self._store(profiler, response)
+        except Exception as e:
+            # A debugging aid must never turn into a failed request
+            print(f"Request profiler error: {e}")
+        return response
+
+    def _store(self, profiler, response):
+        duration_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+        profiler.create_stats()
+
+        with self._lock:
+            profile_id = next(self._ids)
+        self.profiles.append({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'trigger': g.pop('profile_trigger'),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'durationMs': round(duration_ms, 3),
+            'thread': threading.get_ident(),
+            'allThreads': PROFILES_ALL_THREADS,
+            'stages': _stage_breakdown(profiler.stats),
+            'topFunctions': _top_functions(profiler.stats),
+            'stats': profiler.stats,
+        })
+        response.headers['X-Yaksha-Profile-Id'] = str(profile_id)
+
+    def _teardown_request(self, exc):
+        # after_request is skipped on unhandled errors; don't leave the thread profiling
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._active.release()
+
+    # --------------------------------------------------------------------------
+    # Admin endpoints
+    # --------------------------------------------------------------------------
+
+    def _find(self, profile_id):
+        return next((p for p in list(self.profiles) if p['id'] == profile_id), None)
+
+    def _deny(self):
+        if not self.token:
+            return jsonify({'error': 'Set YAKSHA_PROFILE_TOKEN to read profiles.'}), 403
+        if not self._authorized():
+            return jsonify({'error': 'Unauthorized'}), 401
+        return None
+
+    def _list(self):
+        denied = self._deny()
+        if denied:
+            return denied
+        summaries = [{k: v for k, v in p.items() if k not in ('stats', 'topFunctions')}
+                     for p in reversed(list(self.profiles))]
+        return jsonify({'profiles': summaries, 'capacity': self.profiles.maxlen})
+
+    def _detail(self, profile_id):
+        denied = self._deny()
+        if denied:
+            return denied
+        profile = self._find(profile_id)
+        if profile is None:
+            return jsonify({'error': 'Profile not found (it may have been evicted).'}), 404
+        return jsonify({k: v for k, v in profile.items() if k != 'stats'})
+
+    def _export(self, profile_id):
+        denied = self._deny()
+        if denied:
+            return denied
+        profile = self._find(profile_id)
+        if profile is None:
+            return jsonify({'error': 'Profile not found (it may have been evicted).'}), 404
+        # Same format as cProfile.Profile.dump_stats(); load with pstats.Stats(path)
+        return Response(marshal.dumps(profile['stats']), mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename=profile_{profile_id}.prof'})
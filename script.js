@@ -260,7 +260,6 @@ function appendMessage(text, sender) {
 // --- Visualizer & Logic ---
 let map, mapMarker, mapPolyline;
 let riskChart;
-let chaosInterval = null;
 
 function initVisuals() {
     // Fix Leaflet Icons (Common issue with CDNs)
@@ -409,32 +408,54 @@ function updateVisuals(data, payload) {
     }
 }
 
-window.toggleChaosMode = function () {
-    if (chaosInterval) {
-        clearInterval(chaosInterval);
-        chaosInterval = null;
+// Chaos Mode: the server generates realistic traffic (card cohorts, travel,
+// injected fraud bursts) and pushes every scored transaction to us over SSE.
+let chaosStream = null;
+let lastChaosRender = 0;
+
+window.toggleChaosMode = async function () {
+    if (chaosStream) {
+        chaosStream.close();
+        chaosStream = null;
+        try {
+            await fetch('http://localhost:5000/traffic/stop', { method: 'POST' });
+        } catch (error) {
+            console.error('Error:', error);
+        }
         alert("Chaos Mode Deactivated.");
         return;
     }
 
-    alert("⚠ CHAOS MODE ACTIVE: Simulating Random Global Transactions...");
+    alert("⚠ CHAOS MODE ACTIVE: Simulating Live Global Transactions...");
 
-    chaosInterval = setInterval(() => {
-        const randomAmount = Math.floor(Math.random() * 5000) + 10;
-        const locs = ['local', 'domestic', 'international'];
-        const randomLoc = locs[Math.floor(Math.random() * locs.length)];
+    chaosStream = new EventSource('http://localhost:5000/stream');
+    chaosStream.addEventListener('transactions', (e) => {
+        const batch = JSON.parse(e.data);
+        if (!batch.events.length) return;
 
-        const payload = {
-            amount: randomAmount,
-            merchant: "Chaos Sim " + Math.floor(Math.random() * 100),
-            location: randomLoc,
-            time: "12:00",
-            cardType: "visa"
-        };
+        // Thousands of events per second: only redraw about once a second,
+        // preferring the most recent fraud in the batch.
+        const now = Date.now();
+        if (now - lastChaosRender < 1000) return;
+        lastChaosRender = now;
 
-        analyzeTransaction(payload);
+        const frauds = batch.events.filter(ev => ev.isFraud);
+        const data = frauds.length ? frauds[frauds.length - 1] : batch.events[batch.events.length - 1];
 
-    }, 1500); // Every 1.5s
+        setChatContext(data.riskScore, data.riskFactors);
+        displayResult(data.isFraud, data.riskScore, data.riskFactors);
+        updateVisuals(data, { amount: data.amount });
+    });
+
+    try {
+        await fetch('http://localhost:5000/traffic/start', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ rate: 500, cards: 2000, burstsPerMinute: 6 })
+        });
+    } catch (error) {
+        console.error('Error:', error);
+    }
 }
 
 /* Mobile Menu */
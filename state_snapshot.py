@@ -0,0 +1,200 @@
+import os
+import time
+import zlib
+import struct
+import atexit
+import threading
+
+# ------------------------------------------------------------------------------
+# BEHAVIORAL STATE SNAPSHOTS (WARM RESTART)
+# ------------------------------------------------------------------------------
+# BehavioralAnalyzer history lives in memory, so a restart used to blind the
+# velocity/location checks until history rebuilt. A background thread now
+# snapshots it to a compact binary file every SNAPSHOT_INTERVAL_SECONDS (and
+# once more at exit, including on SIGTERM via app.py) and app.py restores it
+# on startup.
+#
+# Requests are never blocked on I/O: each analyzer's history is shallow-copied
+# under the scoring lock (entries are never mutated once appended, so the copy
+# is a consistent copy-on-write view) and encoding/writing happens outside it.
+# Analyzers whose version hasn't changed since the last snapshot are skipped,
+# and nothing is written at all when no analyzer changed.
+#
+# File layout (little endian):
+#   header   MAGIC(8) | version u16 | analyzer_count u32
+#   per analyzer: key_len u16 | key utf-8 | version u64 | n u32 | n * (amount, lat, long, timestamp) f64
+#   trailer  crc32 u32 of everything before it
+
+SNAPSHOT_FILE = 'analyzer_state.snap'
+SNAPSHOT_INTERVAL_SECONDS = 30
+
+MAGIC = b'YAKSNAP\x00'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sHI')
+_ANALYZER = struct.Struct('<QI')
+_RECORD = struct.Struct('<dddd')
+
+
+def encode_snapshot(states):
+    """states: {key: (version, [(amount, lat, long, timestamp), ...])} -> bytes"""
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(states))]
+    for key, (version, records) in states.items():
+        key_bytes = key.encode('utf-8')
+        parts.append(struct.pack('<H', len(key_bytes)))
+        parts.append(key_bytes)
+        parts.append(_ANALYZER.pack(version, len(records)))
+        parts.extend(_RECORD.pack(*r) for r in records)
+    body = b''.join(parts)
+    return body + struct.pack('<I', zlib.crc32(body))
+
+
+def decode_snapshot(data):
+    """Inverse of encode_snapshot. Raises ValueError on a corrupt or foreign file."""
+    if len(data) < _HEADER.size + 4:
+        raise ValueError("snapshot too short")
+    body, (crc,) = data[:-4], struct.unpack('<I', data[-4:])
+    if zlib.crc32(body) != crc:
+        raise ValueError("snapshot checksum mismatch")
+
+    magic, version, count = _HEADER.unpack_from(body, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("not a Yaksha analyzer snapshot")
+
+    offset = _HEADER.size
+    states = {}
+    for _ in range(count):
+        (key_len,) = struct.unpack_from('<H', body, offset)
+        offset += 2
+        key = body[offset:offset + key_len].decode('utf-8')
+        offset += key_len
+        analyzer_version, n = _ANALYZER.unpack_from(body, offset)
+        offset += _ANALYZER.size
+        records = list(_RECORD.iter_unpack(body[offset:offset + n * _RECORD.size]))
+        offset += n * _RECORD.size
+        states[key] = (analyzer_version, records)
+    return states
+
+
+class SnapshotWorker:
+    """Periodically writes the analyzers returned by get_analyzers() to path."""
+    def __init__(self, get_analyzers, lock, path=SNAPSHOT_FILE, interval=SNAPSHOT_INTERVAL_SECONDS):
+        """
+        get_analyzers(): {key: BehavioralAnalyzer}
+        lock: the lock scoring holds while it mutates analyzer history
+        """
+        self.get_analyzers = get_analyzers
+        self.lock = lock
+        self.path = path
+        self.interval = interval
+        self._snapshotted_versions = {}
+        self._cached_records = {}
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {
+            'path': path, 'intervalSeconds': interval,
+            'restoredAnalyzers': 0, 'restoredTransactions': 0, 'restoreMs': None,
+            'snapshots': 0, 'skipped': 0, 'lastSnapshotMs': None, 'lastSnapshotBytes': 0,
+            'lastSnapshotAt': None, 'lastError': None,
+        }
+
+    # --------------------------------------------------------------------------
+    # Restore
+    # --------------------------------------------------------------------------
+
+    def restore(self):
+        """Load the snapshot (if any) into the current analyzers. Linear in file size."""
+        if not os.path.exists(self.path):
+            print("No analyzer snapshot found. Starting with empty behavioral history.")
+            return
+
+        start = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as f:
+                states = decode_snapshot(f.read())
+        except Exception as e:
+            self.stats['lastError'] = str(e)
+            print(f"Error restoring analyzer snapshot: {e}")
+            return
+
+        analyzers = self.get_analyzers()
+        restored_analyzers = restored = 0
+        for key, (version, records) in states.items():
+            analyzer = analyzers.get(key)
+            if analyzer is None:
+                continue
+            analyzer.load_state(records, version)
+            self._snapshotted_versions[key] = version
+            self._cached_records[key] = records
+            restored_analyzers += 1
+            restored += len(records)
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+        self.stats.update(restoredAnalyzers=restored_analyzers, restoredTransactions=restored, restoreMs=elapsed_ms)
+        print(f"Restored {restored} transactions for {restored_analyzers} analyzer(s) in {elapsed_ms} ms.")
+
+    # --------------------------------------------------------------------------
+    # Snapshot
+    # --------------------------------------------------------------------------
+
+    def snapshot(self):
+        """Write a snapshot if any analyzer changed. Returns True if a file was written."""
+        with self._write_lock:
+            start = time.perf_counter()
+            states = {}
+            changed = False
+            for key, analyzer in self.get_analyzers().items():
+                if analyzer.version == self._snapshotted_versions.get(key, 0):
+                    # Unchanged (or never used): reuse the previous snapshot's records
+                    states[key] = (analyzer.version, self._cached_records.get(key, []))
+                    continue
+                with self.lock:
+                    version, history = analyzer.version, list(analyzer.history)
+                states[key] = (version, analyzer.to_records(history))
+                changed = True
+
+            if not changed:
+                self.stats['skipped'] += 1
+                return False
+
+            data = encode_snapshot(states)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)  # atomic: readers never see a torn file
+
+            for key, (version, records) in states.items():
+                self._snapshotted_versions[key] = version
+                self._cached_records[key] = records
+            self.stats.update(
+                snapshots=self.stats['snapshots'] + 1,
+                lastSnapshotMs=round((time.perf_counter() - start) * 1000, 3),
+                lastSnapshotBytes=len(data),
+                lastSnapshotAt=time.strftime('%Y-%m-%d %H:%M:%S'),
+            )
+            return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                self.stats['lastError'] = str(e)
+                print(f"Analyzer snapshot error: {e}")
+
+    def start(self):
+        """Start the background thread and take a final snapshot at exit."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='analyzer-snapshot', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.snapshot()
+        except Exception as e:
+            print(f"Analyzer snapshot error: {e}")
@@ -0,0 +1,165 @@
+import os
+import re
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ------------------------------------------------------------------------------
+# STATIC ASSETS
+# ------------------------------------------------------------------------------
+# The dashboard's HTML/CSS/JS are indexed once at startup from an explicit
+# allowlist, precompressed (gzip, plus brotli if the 'brotli' package is
+# installed) and kept in memory with a content-hash ETag. Anything not on the
+# allowlist (local_db.json, *.pkl, credentials.json, source files) is never served.
+#
+# HTML pages are rewritten so their CSS/JS references carry ?v=<hash>. Those
+# fingerprinted URLs are cached by browsers for a year; everything else is
+# revalidated with If-None-Match and answered with 304 when unchanged.
+# Nothing touches the disk per request; under `python app.py` the reloader
+# watches these files and restarts the server when one is edited.
+
+STATIC_ALLOWLIST = [
+    'auth.html', 'dashboard.html', 'web.html', 'signin.html',
+    'script.js', 'style.css', 'chat.css',
+]
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+}
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+MIN_COMPRESS_BYTES = 256
+
+
+class StaticAsset:
+    def __init__(self, name, body, mtime):
+        self.name = name
+        self.mtime = mtime
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        # encoding -> bytes ('identity' is always present)
+        self.bodies = {'identity': body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.bodies['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.bodies['br'] = brotli.compress(body, quality=11)
+
+    def etag(self, encoding):
+        # One validator per representation, as each encoding is different bytes
+        return f'"{self.version}"' if encoding == 'identity' else f'"{self.version}-{encoding}"'
+
+
+def _accepted_encodings(accept_encoding):
+    """Parse Accept-Encoding into the set of codings with q > 0."""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison: ignore W/ prefixes
+    candidates = [t.strip() for t in if_none_match.split(',')]
+    return any(t[2:] == etag if t.startswith('W/') else t == etag for t in candidates)
+
+
+class StaticAssetCache:
+    def __init__(self, root='.', allowlist=STATIC_ALLOWLIST):
+        self.root = root
+        self.allowlist = list(allowlist)
+        self.assets = {}
+        self.load()
+
+    def _read(self, name):
+        path = os.path.join(self.root, name)
+        with open(path, 'rb') as f:
+            return f.read(), os.path.getmtime(path)
+
+    def load(self):
+        """(Re)index every allowlisted file. Missing files are skipped."""
+        assets = {}
+        raw = {}
+        for name in self.allowlist:
+            try:
+                raw[name] = self._read(name)
+            except OSError:
+                print(f"Warning: static asset '{name}' not found.")
+
+        # Fingerprint CSS/JS first so the HTML can reference their hashes
+        for name, (body, mtime) in raw.items():
+            if not name.endswith('.html'):
+                assets[name] = StaticAsset(name, body, mtime)
+        for name, (body, mtime) in raw.items():
+            if name.endswith('.html'):
+                assets[name] = StaticAsset(name, self._fingerprint_refs(body, assets), mtime)
+
+        self.assets = assets
+        print(f"Indexed {len(assets)} static assets.")
+
+    def _fingerprint_refs(self, html, assets):
+        """Rewrite href="style.css" / src="script.js" to include ?v=<hash>."""
+        def replace(m):
+            asset = assets.get(m.group(3))
+            if asset is None:
+                return m.group(0)
+            return f'{m.group(1)}={m.group(2)}{m.group(3)}?v={asset.version}{m.group(2)}'
+        text = html.decode('utf-8')
+        return re.sub(r'(href|src)=(["\'])([\w.-]+\.(?:css|js))\2', replace, text).encode('utf-8')
+
+    def paths(self):
+        """Paths of the allowlisted files (for the dev server's reloader)."""
+        return [os.path.join(self.root, name) for name in self.allowlist]
+
+    def respond(self, name, headers, args, response_class):
+        """
+        Build a Flask response for an allowlisted asset, or None if not allowed.
+        headers/args: the request's headers and query args.
+        """
+        asset = self.assets.get(name)
+        if asset is None:
+            return None
+
+        accepted = _accepted_encodings(headers.get('Accept-Encoding'))
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.bodies and candidate in accepted:
+                encoding = candidate
+                break
+
+        etag = asset.etag(encoding)
+        fingerprinted = args.get('v') == asset.version
+        response_headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE_CACHE if fingerprinted else REVALIDATE_CACHE,
+            'Vary': 'Accept-Encoding',
+        }
+
+        if _etag_matches(headers.get('If-None-Match'), etag):
+            return response_class(status=304, headers=response_headers)
+
+        if encoding != 'identity':
+            response_headers['Content-Encoding'] = encoding
+        return response_class(asset.bodies[encoding], status=200,
+                              content_type=asset.content_type, headers=response_headers)
+
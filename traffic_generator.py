@@ -0,0 +1,296 @@
+import math
+import time
+import random
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+# ------------------------------------------------------------------------------
+# SYNTHETIC TRAFFIC GENERATOR
+# ------------------------------------------------------------------------------
+# Server-side replacement for the browser "Chaos Mode" loop. Produces a stream
+# of realistic transactions at a configurable rate and pushes them through the
+# real scoring path (app.score_transactions) in small batches:
+#   - card cohorts: each card has a home city, a spending level and a few
+#     favourite merchants, and its own BehavioralAnalyzer history
+#   - travel: cards occasionally move to another city and stay quiet for the
+#     travel time, so honest trips don't look like impossible jumps
+#   - fraud bursts: a victim card suddenly sees a rapid run of large purchases
+#     from a distant city (cloned card), flagged 'injected' in the output
+# Scored results are handed to publish_fn (the SSE broker).
+
+TICK_SECONDS = 0.05
+MAX_BACKLOG_SECONDS = 1.0   # shed load instead of queueing more than this
+TRAVEL_SPEED_KMH = 800
+
+# /traffic/start is unauthenticated and the cohort is allocated up front
+MAX_RATE = 5000
+MAX_CARDS = 50000
+
+# Honest cards transact about once every 10 simulated minutes, well under the
+# BehavioralAnalyzer velocity rule (3+ in 5 minutes). The cohort grows with
+# rate to keep this true; past MAX_CARDS simulated time runs faster instead.
+HONEST_TX_PER_CARD_HOUR = 6
+
+
+def _distance_km(a, b):
+    # Same degree->km approximation BehavioralAnalyzer uses
+    return math.sqrt((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) * 111
+
+
+def _honest_cohort(rate, cards, time_scale):
+    """Cohort size and time scale that keep honest per-card traffic realistic."""
+    # Per card: rate / cards tx per wall second = rate * 3600 / (cards * time_scale) per simulated hour
+    needed = math.ceil(rate * 3600 / (time_scale * HONEST_TX_PER_CARD_HOUR))
+    cards = max(1, min(max(int(cards), needed), MAX_CARDS))
+    time_scale = max(time_scale, rate * 3600 / (cards * HONEST_TX_PER_CARD_HOUR))
+    return cards, round(time_scale, 2)
+
+
+class Card:
+    def __init__(self, card_id, home_city, avg_amount, merchants, category, analyzer):
+        self.card_id = card_id
+        self.home_city = home_city
+        self.city = home_city
+        self.avg_amount = avg_amount
+        self.merchants = merchants
+        self.category = category
+        self.analyzer = analyzer
+        self.busy_until = None
+
+
+class TrafficGenerator:
+    def __init__(self, score_fn, publish_fn, analyzer_factory, cities, home_cities,
+                 merchants, categories, states=None):
+        """
+        score_fn(batch, analyzers, record_drift) -> list of response dicts (app.score_transactions)
+        publish_fn(events): receives the compact scored events
+        analyzer_factory(): returns a fresh BehavioralAnalyzer for a card
+        cities: {name: (lat, long)} the generator may route cards through
+        home_cities: names cards live in (e.g. cities seen in training)
+        states: {city name: state code} for cities whose state is known; those
+        are sent as "City, ST" like the training data
+        """
+        self.score_fn = score_fn
+        self.publish_fn = publish_fn
+        self.analyzer_factory = analyzer_factory
+        self.cities = cities
+        self.home_cities = home_cities
+        self.merchants = merchants
+        self.categories = categories
+        self.states = states or {}
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._reset_stats()
+        self.config = {}
+
+    def _reset_stats(self):
+        self.stats = {
+            'generated': 0, 'scored': 0, 'shed': 0, 'errors': 0,
+            'flagged': 0, 'injected': 0, 'injectedCaught': 0, 'bursts': 0,
+            'travels': 0, 'startedAt': None, 'lastBatchMs': 0.0,
+        }
+
+    # --------------------------------------------------------------------------
+    # Control
+    # --------------------------------------------------------------------------
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, rate=500, cards=2000, bursts_per_minute=6, time_scale=60,
+              travel_probability=0.002, seed=None):
+        """
+        rate: target transactions per second (at most MAX_RATE)
+        cards: minimum size of the card cohort (at most MAX_CARDS)
+        bursts_per_minute: injected fraud bursts per wall-clock minute
+        time_scale: simulated seconds per wall second (transaction timestamps)
+        The cohort and time scale are raised as needed so each honest card
+        makes about HONEST_TX_PER_CARD_HOUR simulated transactions per hour.
+        """
+        rate = max(1, min(int(rate), MAX_RATE))
+        cards, time_scale = _honest_cohort(rate, cards, time_scale)
+        with self._lock:
+            if self.is_running():
+                self.stop()
+            self.config = {
+                'rate': rate, 'cards': cards, 'burstsPerMinute': bursts_per_minute,
+                'timeScale': time_scale, 'travelProbability': travel_probability,
+            }
+            self._rng = random.Random(seed)
+            self._cards = [self._new_card(i) for i in range(cards)]
+            self._pending_fraud = deque()
+            self._reset_stats()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='traffic-generator', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def status(self):
+        stats = dict(self.stats)
+        elapsed = time.monotonic() - stats['startedAt'] if stats['startedAt'] else 0
+        stats['running'] = self.is_running()
+        stats['config'] = self.config
+        stats['achievedRate'] = round(stats['scored'] / elapsed, 1) if elapsed else 0.0
+        stats.pop('startedAt')
+        return stats
+
+    # --------------------------------------------------------------------------
+    # Transaction synthesis
+    # --------------------------------------------------------------------------
+
+    def _new_card(self, i):
+        rng = self._rng
+        return Card(
+            card_id=f"card_{i:06d}",
+            home_city=rng.choice(self.home_cities),
+            avg_amount=rng.lognormvariate(7.5, 0.8),  # median ~1800
+            merchants=rng.sample(self.merchants, min(3, len(self.merchants))),
+            category=rng.choice(self.categories),
+            analyzer=self.analyzer_factory(),
+        )
+
+    def _sim_time(self, now):
+        elapsed = now - self.stats['startedAt']
+        return self._sim_start + timedelta(seconds=elapsed * self.config['timeScale'])
+
+    def _payload(self, card, city, amount, merchant, sim_time):
+        return {
+            'amount': round(amount, 2),
+            'merchant': merchant,
+            'cardType': card.category,
+            'location': f"{city.title()}, {self.states[city]}" if city in self.states else city.title(),
+            'date': sim_time.strftime('%Y-%m-%d'),
+            'time': sim_time.strftime('%H:%M'),
+        }
+
+    def _honest_transaction(self, sim_time):
+        rng = self._rng
+        # A few tries to find a card that isn't mid-flight
+        for _ in range(4):
+            card = rng.choice(self._cards)
+            if card.busy_until is None or card.busy_until <= sim_time:
+                break
+        else:
+            return None
+
+        if rng.random() < self.config['travelProbability']:
+            if card.city != card.home_city and rng.random() < 0.5:
+                destination = card.home_city
+            else:
+                destination = rng.choice(list(self.cities))
+            hours = _distance_km(self.cities[card.city], self.cities[destination]) / TRAVEL_SPEED_KMH
+            card.city = destination
+            card.busy_until = sim_time + timedelta(hours=hours + 1)
+            self.stats['travels'] += 1
+            return None
+
+        amount = max(10.0, rng.gauss(card.avg_amount, card.avg_amount * 0.3))
+        return card, self._payload(card, card.city, amount, rng.choice(card.merchants), sim_time), False
+
+    def _inject_burst(self):
+        rng = self._rng
+        card = rng.choice(self._cards)
+        here = self.cities[card.city]
+        far = [c for c in self.cities if _distance_km(self.cities[c], here) > 2000]
+        fraud_city = rng.choice(far or list(self.cities))
+        for _ in range(rng.randint(3, 8)):
+            self._pending_fraud.append((card, fraud_city, card.avg_amount * rng.uniform(5, 20)))
+        self.stats['bursts'] += 1
+
+    def _next_batch(self, n, sim_time):
+        batch, cards, injected = [], [], []
+        rng = self._rng
+        attempts = 0
+        while len(batch) < n and attempts < n * 10:
+            attempts += 1
+            if self._pending_fraud and rng.random() < 0.3:
+                card, city, amount = self._pending_fraud.popleft()
+                item = (card, self._payload(card, city, amount, rng.choice(self.merchants), sim_time), True)
+            else:
+                item = self._honest_transaction(sim_time)
+                if item is None:
+                    continue
+            batch.append(item[1])
+            cards.append(item[0])
+            injected.append(item[2])
+        return batch, cards, injected
+
+    # --------------------------------------------------------------------------
+    # Main loop
+    # --------------------------------------------------------------------------
+
+    def _run(self):
+        start = time.monotonic()
+        self.stats['startedAt'] = start
+        self._sim_start = datetime.now()
+        next_burst = start
+
+        while not self._stop.is_set():
+            tick_start = time.monotonic()
+            rate = self.config['rate']
+
+            burst_interval = 60.0 / self.config['burstsPerMinute'] if self.config['burstsPerMinute'] else None
+            if burst_interval and tick_start >= next_burst:
+                self._inject_burst()
+                next_burst = tick_start + self._rng.expovariate(1.0 / burst_interval)
+
+            # How far behind the target rate we are; shed anything beyond the
+            # backlog cap rather than queueing unboundedly.
+            due = int((tick_start - start) * rate) - self.stats['generated'] - self.stats['shed']
+            max_due = int(rate * MAX_BACKLOG_SECONDS)
+            if due > max_due:
+                self.stats['shed'] += due - max_due
+                due = max_due
+
+            if due > 0:
+                self._score_batch(due, self._sim_time(tick_start))
+
+            sleep_for = TICK_SECONDS - (time.monotonic() - tick_start)
+            if sleep_for > 0:
+                self._stop.wait(sleep_for)
+
+    def _score_batch(self, n, sim_time):
+        batch, cards, injected = self._next_batch(n, sim_time)
+        self.stats['generated'] += len(batch)
+
+        t0 = time.perf_counter()
+        try:
+            # Synthetic traffic stays out of the live drift sketches
+            results = self.score_fn(batch, [c.analyzer for c in cards], record_drift=False)
+        except Exception as e:
+            self.stats['errors'] += len(batch)
+            print(f"Traffic generator scoring error: {e}")
+            return
+        self.stats['lastBatchMs'] = round((time.perf_counter() - t0) * 1000, 2)
+
+        events = []
+        for payload, card, is_injected, result in zip(batch, cards, injected, results):
+            if result['isFraud']: self.stats['flagged'] += 1
+            if is_injected:
+                self.stats['injected'] += 1
+                if result['isFraud']: self.stats['injectedCaught'] += 1
+            events.append({
+                'card': card.card_id,
+                'amount': payload['amount'],
+                'merchant': payload['merchant'],
+                'location': payload['location'],
+                'isFraud': result['isFraud'],
+                'riskScore': result['riskScore'],
+                'mlScore': result['mlScore'],
+                'behavioralScore': result['behavioralScore'],
+                'riskFactors': result['riskFactors'],
+                'details': result['details'],
+                'locationData': result['locationData'],
+                'injected': is_injected,
+                'source': 'generator',
+            })
+        self.stats['scored'] += len(events)
+        self.publish_fn(events)
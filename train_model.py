@@ -7,6 +7,8 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from datetime import datetime
 import os
+from feature_store import build_feature_store, FEATURE_STORE_DIR
+from drift_monitor import build_reference_profile, save_reference_profile, DRIFT_REFERENCE_FILENAME
 
 # ------------------------------------------------------------------------------
 # CONFIGURATION
@@ -126,7 +128,23 @@ def train():
     
     print(f"Saving encoders to {ENCODERS_FILENAME}...")
     joblib.dump(encoders, ENCODERS_FILENAME)
+
+    # Per-merchant/category/city aggregates so app.py can look up real
+    # city_pop, age, job and merchant location instead of random placeholders,
+    # and report merchant/category fraud rates with each prediction.
+    missing_raw = [c for c in ['merchant', 'category', 'city', 'state', 'job'] if c not in df.columns]
+    if missing_raw:
+        print(f"Warning: Skipping feature store, missing columns: {missing_raw}")
+    else:
+        print(f"Building feature store in {FEATURE_STORE_DIR}/...")
+        build_feature_store(df, target_col, FEATURE_STORE_DIR)
     
+    # Training distribution of the model inputs (and held-out scores) that
+    # app.py's drift monitor compares live traffic against.
+    print(f"Saving drift reference profile to {DRIFT_REFERENCE_FILENAME}...")
+    ml_scores = (model.predict_proba(X_test)[:, 1] * 100).astype(int)
+    save_reference_profile(build_reference_profile(X, ml_scores), DRIFT_REFERENCE_FILENAME)
+
     print("Done! You can now run 'python app.py'.")
 
 if __name__ == "__main__":